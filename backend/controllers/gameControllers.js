@@ -1,3 +1,5 @@
+import { broadcast } from "../server.js";
+
 const fetchNoteDetails = async (connection, { sensor_ID, range_ID }) => {
     try {
         const [rows] = await connection.execute(
@@ -72,6 +74,7 @@ export const updateGameLength = async (ws, connection, payload) => {
             [length]
         );
         ws.send(JSON.stringify({ action: 'updateGameLength', message: "Game Length updated successfully" }));
+        broadcast({ action: 'gameLengthChanged', data: { length } });
     } catch (error) {
         console.error("Failed to update Game Length:", error);
         ws.send(JSON.stringify({ action: 'updateGameLength', error: "Failed to update Game Length" }));
@@ -1,3 +1,5 @@
+import { broadcast } from "../server.js";
+
 export const fetchAllModes = async (ws, connection) => {
     try {
         const [rows] = await connection.execute("SELECT * FROM mode");
@@ -39,6 +41,8 @@ export const updateActiveMode = async (ws, connection, payload) => {
             await connection.execute("INSERT INTO active_mode (mode_ID) VALUES (?)", [mode_ID]);
         }
         ws.send(JSON.stringify({ action: 'updateActiveMode', message: "Active mode updated successfully" }));
+        // Let the controller devices refresh their cached mode
+        broadcast({ action: 'activeModeChanged', data: { mode_ID } });
     } catch (error) {
         console.error("Failed to update active mode:", error);
         ws.send(JSON.stringify({ action: 'updateActiveMode', error: "Failed to update active mode" }));
@@ -152,6 +152,21 @@ export const sendLEDTrigger = async (ws, payload) => {
 
 
 
+// Controllers publish LED triggers straight to MQTT and report them here for the record
+export const ledTriggerAudit = async (ws, payload) => {
+    const { triggers, request_id } = payload;
+
+    if (!Array.isArray(triggers)) {
+        ws.send(JSON.stringify({ action: 'ledTriggerAudit', error: 'Invalid input data: triggers must be a list', request_id }));
+        return;
+    }
+
+    triggers.forEach(({ topic, message }) => {
+        console.log(`Controller published ${message} to ${topic}`);
+    });
+    ws.send(JSON.stringify({ action: 'ledTriggerAudit', message: `Recorded ${triggers.length} LED triggers`, request_id }));
+};
+
 export const updateLEDStatus = async (ws, connection, payload) => {
     try {
         const [rows] = await connection.execute("SELECT * FROM led_on_status");
@@ -84,6 +84,8 @@ export const updateRange = async (ws, connection, payload) => {
                     upper_limit
                 }
             }));
+            // Controllers swap the one range into their lookup index
+            broadcast({ action: 'rangesChanged', data: [{ range_ID, range_name, lower_limit, upper_limit }] });
         }
     } catch (error) {
         console.error("Failed to update range settings:", error);
@@ -217,6 +219,15 @@ export const updateSelectedOutput = async (ws, connection, payload) => {
         }
 
         ws.send(JSON.stringify({ action: 'updateSelectedOutput', message: "Selected outputs updated successfully" }));
+        // Push the changed sensor/range -> note entries to the controller devices
+        broadcast({
+            action: 'noteMapChanged',
+            data: range_outputs.map(({ range_ID, note_ID }) => ({
+                sensor_ID: Number(sensor_ID),
+                range_ID: Number(range_ID),
+                note_ID: note_ID === null ? null : Number(note_ID)
+            }))
+        });
     } catch (error) {
         console.error("Failed to update selected outputs:", error);
         ws.send(JSON.stringify({ action: 'updateSelectedOutput', error: "Failed to update selected outputs" }));
@@ -1,3 +1,5 @@
+import { broadcast } from "../server.js";
+
 export const fetchAllPositions = async (ws, connection) => {
     try {
         const [rows] = await connection.execute("SELECT * FROM position");
@@ -18,6 +20,15 @@ export const fetchAllSecuritySequences = async (ws, connection) => {
     }
 };
 
+// Form fields arrive as strings; pushed rows use numeric IDs like the ones read from the database
+const sequenceRow = (sequence_ID, direction, step1_position_ID, step2_position_ID, step3_position_ID) => ({
+    sequence_ID: Number(sequence_ID),
+    direction,
+    step1_position_ID: Number(step1_position_ID),
+    step2_position_ID: Number(step2_position_ID),
+    step3_position_ID: Number(step3_position_ID)
+});
+
 export const addSecuritySequence = async (ws, connection, payload) => {
     const { direction, step1_position_ID, step2_position_ID, step3_position_ID } = payload;
 
@@ -28,11 +39,16 @@ export const addSecuritySequence = async (ws, connection, payload) => {
     }
 
     try {
-        await connection.execute(
+        const [result] = await connection.execute(
             "INSERT INTO security_sequence (direction, step1_position_ID, step2_position_ID, step3_position_ID) VALUES (?, ?, ?, ?)",
             [direction, step1_position_ID, step2_position_ID, step3_position_ID]
         );
         ws.send(JSON.stringify({ action: 'addSecuritySequence', message: "Security sequence added successfully" }));
+        // Controllers apply the one changed sequence instead of reloading them all
+        broadcast({
+            action: 'securitySequencesChanged',
+            data: { changed: [sequenceRow(result.insertId, direction, step1_position_ID, step2_position_ID, step3_position_ID)] }
+        });
     } catch (error) {
         console.error("Failed to add security sequence:", error);
         ws.send(JSON.stringify({ action: 'addSecuritySequence', error: "Failed to add security sequence" }));
@@ -54,6 +70,10 @@ export const updateSecuritySequence = async (ws, connection, payload) => {
             [direction, step1_position_ID, step2_position_ID, step3_position_ID, sequence_ID]
         );
         ws.send(JSON.stringify({ action: 'updateSecuritySequence', message: "Security sequence updated successfully" }));
+        broadcast({
+            action: 'securitySequencesChanged',
+            data: { changed: [sequenceRow(sequence_ID, direction, step1_position_ID, step2_position_ID, step3_position_ID)] }
+        });
     } catch (error) {
         console.error("Failed to update security sequence:", error);
         ws.send(JSON.stringify({ action: 'updateSecuritySequence', error: "Failed to update security sequence" }));
@@ -72,6 +92,7 @@ export const deleteSecuritySequence = async (ws, connection, payload) => {
     try {
         await connection.execute("DELETE FROM security_sequence WHERE sequence_ID = ?", [sequence_ID]);
         ws.send(JSON.stringify({ action: 'deleteSecuritySequence', message: "Security sequence deleted successfully" }));
+        broadcast({ action: 'securitySequencesChanged', data: { deleted: [Number(sequence_ID)] } });
     } catch (error) {
         console.error("Failed to delete security sequence:", error);
         ws.send(JSON.stringify({ action: 'deleteSecuritySequence', error: "Failed to delete security sequence" }));
@@ -98,6 +98,42 @@ export const logSensorData = async (ws, connection, payload) => {
     }
 };
 
+export const logSensorDataBatch = async (ws, connection, payload) => {
+    const { readings, request_id } = payload;
+
+    if (!Array.isArray(readings) || readings.some(r => r.sensor_ID === undefined || r.distance === undefined)) {
+        console.error("Invalid input data: readings must be a list of sensor_ID and distance");
+        ws.send(JSON.stringify({ action: 'logSensorDataBatch', error: "Invalid input data: readings must be a list of sensor_ID and distance", request_id }));
+        return;
+    }
+
+    if (readings.length === 0) {
+        ws.send(JSON.stringify({ action: 'logSensorDataBatch', message: "No sensor data to log", request_id }));
+        return;
+    }
+
+    try {
+        // Readings carry the controller's epoch timestamp so replayed batches keep their original time
+        const placeholders = readings.map(() => "(?, ?, FROM_UNIXTIME(?))").join(", ");
+        const values = readings.flatMap(r => [r.sensor_ID, r.distance, r.timestamp ?? Date.now() / 1000]);
+        await connection.execute(`INSERT INTO input (sensor_ID, distance, timestamp) VALUES ${placeholders}`, values);
+
+        const [rows] = await connection.execute(
+            `SELECT i.sensor_ID, s.sensor_name, i.distance, i.timestamp 
+             FROM input i 
+             JOIN sensor s ON i.sensor_ID = s.sensor_ID
+             ORDER BY i.timestamp DESC
+             LIMIT 10`
+        );
+        broadcast({ action: 'logSensorData', data: rows });
+
+        ws.send(JSON.stringify({ action: 'logSensorDataBatch', message: `Logged ${readings.length} sensor readings`, request_id }));
+    } catch (error) {
+        console.error("Failed to log sensor data batch:", error);
+        ws.send(JSON.stringify({ action: 'logSensorDataBatch', error: "Failed to log sensor data batch", request_id }));
+    }
+};
+
 export const updateSensorStatus = async (ws, connection, payload) => {
     const { sensors_on } = payload;
 
@@ -134,6 +170,61 @@ export const updateSensorAlive = async (ws, connection, payload) => {
     }
 };
 
+// Bulk alive/dead transitions for sensors and LED strips, sent by the controller only when something changes
+export const updateDeviceHealth = async (ws, connection, payload) => {
+    const { sensors = [], led_strips = [], sensors_alive, request_id } = payload;
+
+    if (!Array.isArray(sensors) || !Array.isArray(led_strips) || led_strips.some(s => s.led_strip_name === undefined || s.alive === undefined)) {
+        console.error("Invalid input data: sensors and led_strips must be lists of devices with an alive flag");
+        ws.send(JSON.stringify({ action: 'updateDeviceHealth', error: "Invalid input data: sensors and led_strips must be lists of devices with an alive flag", request_id }));
+        return;
+    }
+
+    try {
+        if (sensors_alive !== undefined) {
+            await connection.execute("UPDATE alive SET active = ?", [sensors_alive]);
+        }
+
+        if (led_strips.length > 0) {
+            const names = led_strips.map(s => s.led_strip_name);
+            const [existing] = await connection.execute(
+                `SELECT LED_strip_name FROM LED_strip WHERE LED_strip_name IN (${names.map(() => "?").join(", ")})`, names
+            );
+            const known = new Set(existing.map(row => row.LED_strip_name));
+
+            const updates = led_strips.filter(s => known.has(s.led_strip_name));
+            if (updates.length > 0) {
+                const cases = updates.map(() => "WHEN ? THEN ?").join(" ");
+                const caseValues = updates.flatMap(s => [s.led_strip_name, s.alive]);
+                await connection.execute(
+                    `UPDATE LED_strip SET LED_alive = CASE LED_strip_name ${cases} END, LED_active = CASE LED_strip_name ${cases} END
+                     WHERE LED_strip_name IN (${updates.map(() => "?").join(", ")})`,
+                    [...caseValues, ...caseValues, ...updates.map(s => s.led_strip_name)]
+                );
+            }
+
+            const inserts = led_strips.filter(s => !known.has(s.led_strip_name));
+            if (inserts.length > 0) {
+                const [colourRows] = await connection.execute("SELECT colour_ID FROM colour LIMIT 1");
+                if (colourRows.length > 0) {
+                    await connection.execute(
+                        `INSERT INTO LED_strip (LED_strip_name, LED_alive, LED_active, colour_ID) VALUES ${inserts.map(() => "(?, ?, ?, ?)").join(", ")}`,
+                        inserts.flatMap(s => [s.led_strip_name, s.alive, s.alive, colourRows[0].colour_ID])
+                    );
+                } else {
+                    console.error("No default colour_ID found; new LED strips were not registered");
+                }
+            }
+        }
+
+        broadcast({ action: 'deviceHealthChanged', data: { sensors, led_strips } });
+        ws.send(JSON.stringify({ action: 'updateDeviceHealth', message: `Updated ${sensors.length + led_strips.length} devices`, request_id }));
+    } catch (error) {
+        console.error("Failed to update device health:", error);
+        ws.send(JSON.stringify({ action: 'updateDeviceHealth', error: "Failed to update device health", request_id }));
+    }
+};
+
 export const fetchSensorRanges = async (ws, connection) => {
     try {
         const [rows] = await connection.execute("SELECT range_ID, lower_limit, upper_limit FROM sensor_range");
@@ -330,6 +421,8 @@ export const updateActionTableWithPreset = async (ws, connection, payload) => {
         await Promise.all(queries);
 
         ws.send(JSON.stringify({ action: 'updateActionTableWithPreset', message: "Action table updated successfully" }));
+        // The whole table may have changed; controller devices reload it
+        broadcast({ action: 'noteMapChanged' });
     } catch (error) {
         console.error("Failed to update action table with preset:", error);
         ws.send(JSON.stringify({ action: 'updateActionTableWithPreset', error: "Failed to update action table with preset" }));
@@ -20,8 +20,8 @@ import {
     updateMute
 } from "../controllers/otherControllers.js";
 import { fetchInitialLedData, updateLedStripStatus, updateLedStripAlive, fetchLedStripId, fetchColourRgb, updateLedStripColor, gameLedTrigger, checkLEDOn } from "../controllers/ledstripControllers.js";
-import { sendControlMessage, sendMuteMessage, sendLEDTrigger, getLEDTriggerPayload, updateLEDStatus } from '../controllers/mqttAppControllers.js';
-import { getSensors, logSensorData, updateSensorStatus, updateSensorAlive, fetchSensorRanges, fetchLightDuration, fetchInitialData, controlSensor, controlMute, getMuteStatus, getCurrentSettings, updateMuteStatus, fetchAllPresets, updateActionTableWithPreset } from "../controllers/sensorControllers.js";
+import { sendControlMessage, sendMuteMessage, sendLEDTrigger, ledTriggerAudit, getLEDTriggerPayload, updateLEDStatus } from '../controllers/mqttAppControllers.js';
+import { getSensors, logSensorData, logSensorDataBatch, updateSensorStatus, updateSensorAlive, updateDeviceHealth, fetchSensorRanges, fetchLightDuration, fetchInitialData, controlSensor, controlMute, getMuteStatus, getCurrentSettings, updateMuteStatus, fetchAllPresets, updateActionTableWithPreset } from "../controllers/sensorControllers.js";
 import {fetchAllPositions, fetchAllSecuritySequences, addSecuritySequence, updateSecuritySequence, deleteSecuritySequence} from "../controllers/securityModeControllers.js";
 import {fetchAllModes, updateActiveMode, fetchActiveMode} from "../controllers/modeSettingControllers.js";
 import {getRangeLimits, determineLEDColor, updateRangeSettings, setLEDColors} from "../controllers/ledstripConfigControllers.js";
@@ -114,6 +114,9 @@ export default (wss, connection) => {
                 case 'sendLEDTrigger':
                     await sendLEDTrigger(ws, payload);
                     break;
+                case 'ledTriggerAudit':
+                    await ledTriggerAudit(ws, payload);
+                    break;
                 case 'getSensors':
                     await getSensors(ws, connection);
                     break;
@@ -123,6 +126,9 @@ export default (wss, connection) => {
                 case 'logSensorData':
                     await logSensorData(ws, connection, payload);
                     break;
+                case 'logSensorDataBatch':
+                    await logSensorDataBatch(ws, connection, payload);
+                    break;
                 case 'fetch_current_settings':
                     await getCurrentSettings(ws, connection, payload);
                     break;
@@ -132,6 +138,9 @@ export default (wss, connection) => {
                 case 'updateSensorAlive':
                     await updateSensorAlive(ws, connection, payload);
                     break;
+                case 'updateDeviceHealth':
+                    await updateDeviceHealth(ws, connection, payload);
+                    break;
                 case 'fetchSensorRanges':
                     await fetchSensorRanges(ws, connection);
                     break;
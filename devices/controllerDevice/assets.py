@@ -0,0 +1,134 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pygame
+import pygame.sndarray
+import audio
+from config import ASSET_CACHE_DIR, ASSET_WORKERS
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Decoded PCM is cached as .npy files named by the source file's hash and the mixer format,
+# so a later start maps the samples straight in instead of decoding the file again
+_INDEX_FILE = os.path.join(ASSET_CACHE_DIR, "index.json")
+
+_paths = {}  # note_ID -> source file
+_sounds = {}  # note_ID -> decoded Sound
+_loading = {}  # note_ID -> Future of a decode in progress
+_hashes = None  # path -> [mtime, size, sha1], so unchanged files are not re-read to hash them
+_lock = threading.Lock()
+_pool = None
+
+def register(notes):
+    """Record where each note's file is; nothing is decoded until it is needed."""
+    with _lock:
+        for note in notes:
+            path = note["note_location"]
+            if _paths.get(note["note_ID"]) != path:
+                _paths[note["note_ID"]] = path
+                _sounds.pop(note["note_ID"], None)
+    logger.info(f"Registered {len(notes)} note files")
+
+def when_ready(note_id, callback):
+    """Call callback(sound) with a note's Sound, at once if decoded, else from the decoder once it is.
+
+    Never waits on a decode, so it is safe on the scheduler and ingest threads.
+    Returns False if no file is registered for the note.
+    """
+    sound = _sounds.get(note_id)
+    if sound is not None:
+        callback(sound)
+        return True
+    future = _submit(note_id)
+    if future is None:
+        return False
+    future.add_done_callback(lambda done: done.result() is not None and callback(done.result()))
+    return True
+
+def prefetch(note_ids):
+    """Decode the given notes in the background."""
+    for note_id in note_ids:
+        if note_id not in _sounds and note_id in _paths:
+            _submit(note_id)
+
+def _submit(note_id):
+    global _pool
+    with _lock:
+        if note_id not in _paths:
+            logger.warning(f"No file registered for note ID {note_id}")
+            return None
+        future = _loading.get(note_id)
+        if future is None:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=ASSET_WORKERS, thread_name_prefix="assets")
+            future = _loading[note_id] = _pool.submit(_load, note_id, _paths[note_id])
+        return future
+
+def _load(note_id, path):
+    try:
+        sound = _decode(path)
+        with _lock:
+            if _paths.get(note_id) == path:
+                _sounds[note_id] = sound
+        return sound
+    except Exception as e:
+        logger.error(f"Failed to load sound for note ID {note_id} from {path}: {e}")
+        return None
+    finally:
+        with _lock:
+            _loading.pop(note_id, None)
+
+def _decode(path):
+    audio.init()
+    rate, size, channels = pygame.mixer.get_init()
+    cached = os.path.join(ASSET_CACHE_DIR, f"{_file_hash(path)}_{rate}_{size}_{channels}.npy")
+    if os.path.exists(cached):
+        return pygame.sndarray.make_sound(np.load(cached, mmap_mode="r"))
+    sound = pygame.mixer.Sound(path)
+    samples = pygame.sndarray.array(sound)
+    os.makedirs(ASSET_CACHE_DIR, exist_ok=True)
+    with open(f"{cached}.tmp", "wb") as f:
+        np.save(f, samples)
+    os.replace(f"{cached}.tmp", cached)
+    logger.debug(f"Decoded {path} into {cached}")
+    return sound
+
+def _file_hash(path):
+    global _hashes
+    stat = os.stat(path)
+    with _lock:
+        if _hashes is None:
+            try:
+                with open(_INDEX_FILE) as f:
+                    _hashes = json.load(f)
+            except (OSError, ValueError):
+                _hashes = {}
+        known = _hashes.get(path)
+    if known and known[0] == stat.st_mtime and known[1] == stat.st_size:
+        return known[2]
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    with _lock:
+        _hashes[path] = [stat.st_mtime, stat.st_size, digest.hexdigest()]
+        _save_index()
+    return digest.hexdigest()
+
+def _save_index():
+    # Caller holds _lock
+    try:
+        os.makedirs(ASSET_CACHE_DIR, exist_ok=True)
+        with open(f"{_INDEX_FILE}.tmp", "w") as f:
+            json.dump(_hashes, f)
+        os.replace(f"{_INDEX_FILE}.tmp", _INDEX_FILE)
+    except OSError as e:
+        logger.error(f"Failed to save the asset index: {e}")
+
+def loaded():
+    return len(_sounds)
@@ -0,0 +1,124 @@
+import logging
+import queue
+import threading
+import time
+import pygame
+import metrics
+from config import AUDIO_FREQUENCY, AUDIO_CHANNELS, AUDIO_BUFFER, AUDIO_VOICES, AUDIO_STREAM_CHANNELS, EFFECT_SOUNDS
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Voice priorities; a new sound may only steal a channel playing at the same or lower priority
+PRIORITY_SYNTH = 0
+PRIORITY_NOTE = 1
+PRIORITY_EFFECT = 2
+
+effects = {}  # Preloaded effect sounds by name
+_voices = []  # [channel, priority, started_at] for each channel in the pool
+_reserved = []  # Channels outside the pool, handed out to streaming voices
+_commands = queue.Queue()
+_init_lock = threading.Lock()
+_initialized = False
+
+latency = {"count": 0, "total": 0.0, "max": 0.0, "last": 0.0}
+
+OUTPUT_SECONDS = metrics.histogram("staircase_stage_seconds", metrics.STAGE_HELP,
+                                   stage="audio_output")
+VOICES_STOLEN = metrics.counter("staircase_audio_voices_stolen_total", "Playing sounds cut off for a new one")
+SOUNDS_DROPPED = metrics.counter("staircase_audio_sounds_dropped_total", "Sounds dropped with no voice free")
+
+def init():
+    """Initialise the mixer, channel pool and effect sounds exactly once."""
+    global _initialized
+    with _init_lock:
+        if _initialized:
+            return
+        pygame.mixer.pre_init(AUDIO_FREQUENCY, -16, AUDIO_CHANNELS, AUDIO_BUFFER)
+        pygame.mixer.init()
+        pygame.mixer.set_num_channels(AUDIO_VOICES + AUDIO_STREAM_CHANNELS)
+        _voices.extend([pygame.mixer.Channel(i), PRIORITY_SYNTH, 0.0] for i in range(AUDIO_VOICES))
+        _reserved.extend(pygame.mixer.Channel(AUDIO_VOICES + i) for i in range(AUDIO_STREAM_CHANNELS))
+        for name, path in EFFECT_SOUNDS.items():
+            try:
+                effects[name] = pygame.mixer.Sound(path)
+            except Exception as e:
+                logger.error(f"Failed to load effect {name} from {path}: {e}")
+        threading.Thread(target=_dispatch, name="audio", daemon=True).start()
+        _initialized = True
+    logger.info(f"Audio engine ready: {pygame.mixer.get_init()}, buffer={AUDIO_BUFFER}, voices={AUDIO_VOICES}")
+
+def output_latency():
+    """Seconds of audio held in the mixer buffer before a sound is heard."""
+    return AUDIO_BUFFER / AUDIO_FREQUENCY
+
+def play(sound, priority=PRIORITY_NOTE):
+    """Queue a sound for playback; returns immediately."""
+    if not _initialized:
+        init()
+    _commands.put((sound, priority, time.perf_counter()))
+
+def play_effect(name):
+    sound = effects.get(name)
+    if sound is None:
+        logger.warning(f"Effect {name} is not loaded.")
+        return
+    play(sound, PRIORITY_EFFECT)
+
+def stop_all():
+    """Stop every sound in the voice pool; streaming channels are left to their owners."""
+    for voice in _voices:
+        voice[0].stop()
+
+def reserve_channel():
+    """Take a channel out of the mixer for exclusive use, or None if all are taken."""
+    if not _initialized:
+        init()
+    with _init_lock:
+        return _reserved.pop() if _reserved else None
+
+def release_channel(channel):
+    channel.stop()
+    with _init_lock:
+        _reserved.append(channel)
+
+def _allocate(priority):
+    now = time.perf_counter()
+    victim = None
+    for voice in _voices:
+        if not voice[0].get_busy():
+            return voice
+        if voice[1] <= priority and (victim is None or (voice[1], voice[2]) < (victim[1], victim[2])):
+            victim = voice  # Lowest priority first, then the oldest
+    if victim is not None:
+        VOICES_STOLEN.inc()
+        logger.debug(f"Stealing voice playing at priority {victim[1]} for {now - victim[2]:.2f}s")
+    return victim
+
+def _dispatch():
+    while True:
+        sound, priority, triggered_at = _commands.get()
+        voice = _allocate(priority)
+        if voice is None:
+            SOUNDS_DROPPED.inc()
+            logger.info(f"No voice free for priority {priority}; sound dropped.")
+            continue
+        voice[0].play(sound)
+        voice[1] = priority
+        voice[2] = time.perf_counter()
+        delay = voice[2] - triggered_at + output_latency()
+        latency["count"] += 1
+        latency["total"] += delay
+        latency["last"] = delay
+        latency["max"] = max(latency["max"], delay)
+        OUTPUT_SECONDS.observe(delay)
+        logger.debug(f"Trigger-to-output latency {delay * 1000:.1f} ms")
+
+def latency_stats():
+    count = latency["count"]
+    return {
+        "count": count,
+        "mean_ms": latency["total"] / count * 1000 if count else 0.0,
+        "max_ms": latency["max"] * 1000,
+        "last_ms": latency["last"] * 1000,
+    }
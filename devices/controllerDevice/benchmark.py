@@ -0,0 +1,204 @@
+"""Micro-benchmarks for the per-reading Python path.
+
+Runs every hot function against in-process stand-ins for the backend and the
+audio device, and prints the timings as JSON:
+
+    python benchmark.py --output results.json
+    python benchmark.py --baseline results.json  # exits 1 if anything got slower
+
+Timings are in microseconds per call.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+# No sound card is needed; must be set before pygame is imported
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+# The stub config must never reach the real snapshot, PCM cache or log spill; must be set before config is imported
+DATA_DIR = os.environ["STAIRCASE_DATA_DIR"] = tempfile.mkdtemp(prefix="staircase-benchmark-")
+
+import ws_client
+
+RANGES = [
+    {"range_ID": 1, "range_name": "close", "lower_limit": 0, "upper_limit": 10},
+    {"range_ID": 2, "range_name": "mid", "lower_limit": 10, "upper_limit": 20},
+    {"range_ID": 3, "range_name": "far", "lower_limit": 20, "upper_limit": 30},
+]
+SENSORS = range(1, 5)
+POSITIONS = [
+    {"position_ID": (sensor_id - 1) * 3 + range_id, "sensor_ID": sensor_id, "range_ID": range_id}
+    for sensor_id in SENSORS for range_id in (1, 2, 3)
+]
+SECURITY_SEQUENCES = [
+    {"sequence_ID": 1, "step1_position_ID": 1, "step2_position_ID": 5, "step3_position_ID": 9},
+    {"sequence_ID": 2, "step1_position_ID": 1, "step2_position_ID": 5, "step3_position_ID": 7},
+]
+
+class StubBackend:
+    """Answers backend requests from canned data instead of a WebSocket."""
+
+    reconnects = 0
+
+    def __init__(self):
+        self.responses = {
+            "getRanges": RANGES,
+            "getActions": [
+                {"sensor_ID": p["sensor_ID"], "range_ID": p["range_ID"], "note_ID": p["position_ID"]}
+                for p in POSITIONS
+            ],
+            "fetchActiveMode": {"mode_ID": 1},
+            "fetchAllPositions": POSITIONS,
+            "fetchAllSecuritySequences": SECURITY_SEQUENCES,
+            "fetchGameLength": [{"length": 5}],
+        }
+
+    def request(self, action, payload=None, timeout=None):
+        return {"action": action, "data": self.responses.get(action, [])}
+
+    def send(self, action, payload=None):
+        return True
+
+    def notify(self, action, payload=None):
+        return True
+
+    def add_listener(self, callback):
+        pass
+
+    def is_connected(self):
+        return True
+
+class Message:
+    """Stand-in for a paho MQTTMessage."""
+
+    __slots__ = ("topic", "payload")
+
+    def __init__(self, topic, payload):
+        self.topic = topic
+        self.payload = payload
+
+def measure(func, iterations, repeat):
+    """Time func() over repeat rounds of iterations calls; returns per-call statistics."""
+    func()  # Warm caches and lazy initialisation outside the timing
+    rounds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        rounds.append((time.perf_counter() - start) / iterations * 1e6)
+    return {
+        "iterations": iterations * repeat,
+        "mean_us": statistics.fmean(rounds),
+        "median_us": statistics.median(rounds),
+        "min_us": min(rounds),
+        "max_us": max(rounds),
+    }
+
+def setup():
+    """Load every module against the stub backend, as main() would against the real one."""
+    ws_client.client = StubBackend()
+    import scheduler
+    import startup
+    import mode_cache
+    import mqtt_handler
+
+    scheduler.start()
+    startup.start()
+    startup.wait_all()
+    mode_cache.set_mode(1)
+    mqtt_handler.install_routes()
+
+def benchmarks():
+    import sensor_data
+    import mqtt_handler
+    import game
+    import synth
+
+    distances = [2.5, 12.0, 27.5, 45.0]
+    readings = [Message(f"ultrasonic/distance_sensor{sensor_id}", b"%.1f" % (sensor_id * 7.3)) for sensor_id in SENSORS]
+    security_steps = [(1, 1), (2, 2), (3, 3), (2, 1)]
+    counter = iter(range(sys.maxsize))
+
+    def on_message():
+        mqtt_handler.on_message(None, None, readings[next(counter) % len(readings)])
+
+    def play_synthesized_tone():
+        synth.play_synthesized_tone(1, 25)
+
+    def check_security_sequence():
+        sensor_data.check_security_sequence(*security_steps[next(counter) % len(security_steps)])
+
+    def encode_request():
+        ws_client.encode_request("logSensorDataBatch", {"readings": [{"sensor_ID": 1, "distance": 12.5, "timestamp": 0}] * 10})
+
+    response = json.dumps({"action": "getRanges", "data": RANGES, "request_id": "0" * 32})
+
+    def decode_response():
+        ws_client.decode_response(response)
+
+    return {
+        "determine_range_id": lambda: [sensor_data.determine_range_id(d) for d in distances],
+        "on_message": on_message,
+        "generate_sequence_from_first_step": lambda: game.generate_sequence_from_first_step((1, 1)),
+        "play_synthesized_tone": play_synthesized_tone,
+        "check_security_sequence": check_security_sequence,
+        "ws_encode_request": encode_request,
+        "ws_decode_response": decode_response,
+    }
+
+def compare(results, baseline, tolerance):
+    """Return the benchmarks whose mean is more than tolerance slower than the baseline."""
+    regressions = {}
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if previous and result["mean_us"] > previous["mean_us"] * (1 + tolerance):
+            regressions[name] = {"baseline_us": previous["mean_us"], "mean_us": result["mean_us"]}
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=1000, help="calls per timing round")
+    parser.add_argument("--repeat", type=int, default=5, help="timing rounds per benchmark")
+    parser.add_argument("--only", nargs="*", help="run only these benchmarks")
+    parser.add_argument("--output", help="write the results to this file as well as stdout")
+    parser.add_argument("--baseline", help="earlier results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown against the baseline")
+    args = parser.parse_args()
+
+    # Logging would dominate the timings of the functions that log on every call
+    logging.disable(logging.CRITICAL)
+    setup()
+
+    results = {}
+    for name, func in benchmarks().items():
+        if args.only and name not in args.only:
+            continue
+        results[name] = measure(func, args.iterations, args.repeat)
+
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "timestamp": time.time(),
+        "results": results,
+    }
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["regressions"] = compare(results, json.load(f)["results"], args.tolerance)
+
+    shutil.rmtree(DATA_DIR, ignore_errors=True)
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    return 1 if report.get("regressions") else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+import logging
+import threading
+import time
+import numpy as np
+import mode_cache
+import metrics
+import sound
+from config import FILTER_WINDOW, FILTER_EMA_ALPHA, FILTER_HYSTERESIS, FILTER_RESET_GAP
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+SYNTH_MODE = 4  # Synth mode follows the distance continuously rather than by range
+
+class SensorFilter:
+    """Median and EMA filter over one sensor's recent readings, with range hysteresis."""
+
+    __slots__ = ("buffer", "index", "count", "ema", "range_id", "is_muted", "updated_at")
+
+    def __init__(self, window=FILTER_WINDOW):
+        self.buffer = np.zeros(window, dtype=np.float64)
+        self.reset()
+        self.is_muted = None
+
+    def reset(self):
+        self.index = 0
+        self.count = 0
+        self.ema = None
+        self.range_id = None
+        self.updated_at = 0.0
+
+    def update(self, distance, range_index, now=None):
+        """Add a reading; returns (filtered_distance, range_id, range_changed)."""
+        now = time.monotonic() if now is None else now
+        if now - self.updated_at > FILTER_RESET_GAP:
+            self.reset()
+        self.updated_at = now
+
+        self.buffer[self.index] = distance
+        self.index = (self.index + 1) % len(self.buffer)
+        self.count = min(self.count + 1, len(self.buffer))
+        median = float(np.median(self.buffer[:self.count]))
+        self.ema = median if self.ema is None else FILTER_EMA_ALPHA * median + (1 - FILTER_EMA_ALPHA) * self.ema
+
+        # Stay in the current range until the reading is clearly past its boundary
+        if self.range_id is not None and range_index.contains(self.range_id, self.ema, FILTER_HYSTERESIS):
+            return self.ema, self.range_id, False
+        range_id = range_index.lookup(self.ema)
+        changed = range_id != self.range_id
+        self.range_id = range_id
+        return self.ema, range_id, changed
+
+_filters = {}
+_lock = threading.Lock()
+
+stats = {"readings": 0, "passed": 0, "suppressed": 0}
+
+for _name, _help in (("readings", "Raw sensor readings conditioned"),
+                     ("passed", "Readings passed on after conditioning"),
+                     ("suppressed", "Readings suppressed by conditioning")):
+    metrics.counter(f"staircase_conditioning_{_name}_total", _help, read=lambda name=_name: stats[name])
+
+def condition(sensor_id, distance, is_muted):
+    """Filter a raw reading; returns (distance, range_id) to process, or None to drop it.
+
+    Readings pass when the sensor's filtered range changes, when its mute state
+    changes, and every time in synth mode. Runs on the MQTT thread, so it never asks the
+    backend for the mode; until one is cached, synth readings pass only on range changes.
+    """
+    with _lock:
+        stats["readings"] += 1
+        sensor_filter = _filters.get(sensor_id)
+        if sensor_filter is None:
+            sensor_filter = _filters[sensor_id] = SensorFilter()
+        filtered, range_id, changed = sensor_filter.update(distance, sound.range_index)
+        mute_changed = is_muted != sensor_filter.is_muted
+        sensor_filter.is_muted = is_muted
+        if range_id is not None and (changed or mute_changed or mode_cache.cached_mode() == SYNTH_MODE):
+            stats["passed"] += 1
+            return filtered, range_id
+        stats["suppressed"] += 1
+        return None
+
+def reset():
+    with _lock:
+        _filters.clear()
@@ -1,20 +1,11 @@
+import os
+
 # Configuration settings
 MQTT_BROKER = "192.168.0.93"
 MQTT_PORT = 1883
 MQTT_TOPICS = [
-    "ultrasonic/distance_sensor1", 
-    "ultrasonic/distance_sensor2", 
-    "ultrasonic/distance_sensor3", 
-    "ultrasonic/distance_sensor4", 
-    "alive/distance_sensor1", 
-    "alive/distance_sensor2", 
-    "alive/distance_sensor3", 
-    "alive/distance_sensor4",
-    "alive/ledstrip1", 
-    "alive/ledstrip2",
-    "alive/ledstrip3",
-    "alive/ledstrip4" # Add the new topic for LED strips
-    # Add additional LED strip topics as needed
+    "ultrasonic/+",  # Readings from every distance sensor
+    "alive/+"  # Heartbeats from every sensor and LED strip; new devices are discovered from these
 ]
 MQTT_MUTE_TOPIC = "audio/mute"  # New MQTT topic for mute control
 CONTROL_TOPIC = "control/distance_sensor"
@@ -24,23 +15,100 @@ MOTION_CONTROL_TOPIC = "control/motion_sensor"
 
 CONFIG_RANGE_TOPIC = 'config/range_ledstrip'
 CONFIG_TOPICS = [
-	"control/ledstrip1",
-	"control/ledstrip2",
-	"control/ledstrip3",
-	"control/ledstrip4",
-	
-	
+	"config/+",  # Range limits and every strip's colours, as published to the LED strips
 ]
 CONFIG_LED_ON_TOPICS =[
-	"control/led_on1",
-	"control/led_on2",
-	"control/led_on3",
-	"control/led_on4"
+	"control/+",  # led_onN for every strip; also carries CONTROL_TOPIC
 ]
 
+# LED trigger output
+LED_TRIGGER_TOPIC = "trigger/ledstrip"  # Followed by the strip number, as subscribed by the firmware
+LED_TRIGGER_QOS = 0  # Default MQTT QoS for LED frames
+LED_CONFIG_TOPIC = "config/"  # Followed by the strip name; carries range&r,g,b colour settings
+LED_ON_TOPIC = "control/led_on"  # Followed by the strip number; carries r,g,b,on to hold a strip lit
+LED_BATCH_WINDOW = 0.02  # Seconds batched frames and audit records are held before sending
+LED_AUDIT_BACKEND = True  # Report published triggers to the backend for the audit trail
+
 # WebSocket server URL
 WS_SERVER_IP = "192.168.0.37"  # Replace with your PC's IP address
 WS_SERVER_URL = "ws://192.168.0.37:8080"
+WS_REQUEST_TIMEOUT = 5  # Seconds to wait for a reply to a backend request
+WS_PING_INTERVAL = 20  # Keepalive ping interval in seconds
+WS_PING_TIMEOUT = 10  # Seconds to wait for a pong before reconnecting
+WS_RECONNECT_DELAY = 2  # Seconds between reconnection attempts
+
+# Active mode cache
+MODE_CACHE_TTL = 300  # Seconds before the cached mode is revalidated with the backend
+
+# Sensor reading ingest
+INGEST_WORKERS = 2  # Worker threads processing sensor readings
+INGEST_QUEUE_DEPTH = 1  # Readings kept per sensor; older ones are coalesced away
+INGEST_MAX_AGE = 2.0  # Seconds after which a queued reading is dropped as stale
+
+# Sensor signal conditioning
+FILTER_WINDOW = 3  # Readings in each sensor's median filter
+FILTER_EMA_ALPHA = 0.7  # Weight of the newest median in the smoothed distance (1 = no smoothing)
+FILTER_HYSTERESIS = 2.0  # Distance in cm a reading must move past a range boundary to change range
+FILTER_RESET_GAP = 1.5  # Seconds without a reading after which a sensor's filter starts afresh
+
+# Note trigger rate limits, checked before a reading is queued
+RATE_LIMITS = {  # mode_ID -> {"sensor" or "note": (triggers per second, burst)}; unlisted modes are not limited
+    1: {"sensor": (2.0, 3), "note": (1.0, 1)},  # Musical Stairs: each note at most once a second
+    # Security and game need every step, and the synth follows every reading
+}
+
+# Device health
+HEALTH_TIMEOUTS = {  # Seconds of silence after which a device is reported dead
+    "sensor": 960,  # Sensors send alive every 15 minutes; readings also count
+    "led_strip": 90,  # LED strips send alive every minute
+}
+HEALTH_CHECK_INTERVAL = 10  # Seconds between sweeps for silent devices
+HEALTH_REPORT_WINDOW = 0.5  # Seconds transitions are gathered into one status update
+
+# Startup
+STARTUP_READY_TIMEOUT = 30  # Seconds to wait for the active mode's configuration before starting anyway
+
+# Instrumentation
+METRICS_ENABLED = os.getenv("STAIRCASE_METRICS", "0") == "1"  # Off by default; timing hooks are no-ops when off
+METRICS_HOST = "127.0.0.1"  # Prometheus text endpoint is served locally only
+METRICS_PORT = int(os.getenv("STAIRCASE_METRICS_PORT", "9105"))  # 0 disables the HTTP endpoint
+METRICS_FILE = os.getenv("STAIRCASE_METRICS_FILE")  # Also write the metrics to this file when set
+METRICS_FILE_INTERVAL = 15  # Seconds between metrics file writes
+
+# Local storage for data that must survive restarts
+DATA_DIR = os.path.expanduser(os.getenv("STAIRCASE_DATA_DIR", "~/.musical_staircase"))
+
+# Sensor reading logging
+LOG_BATCH_SIZE = 50  # Readings sent per logSensorDataBatch request
+LOG_FLUSH_INTERVAL = 2.0  # Maximum seconds a reading waits before it is flushed
+LOG_BUFFER_LIMIT = 1000  # Readings held in memory before spilling straight to disk
+LOG_SPILL_FILE = os.path.join(DATA_DIR, "sensor_log_spill.jsonl")
+
+# Last-known-good configuration, used at startup and while the backend is unreachable
+SNAPSHOT_DB = os.path.join(DATA_DIR, "config_snapshot.db")
+
+# Streaming synth
+SYNTH_BLOCK = 1024  # Samples rendered per block; sets how quickly pitch follows movement
+SYNTH_VOLUME = 0.4  # Peak amplitude of a synth voice (0-1)
+SYNTH_GLIDE_TIME = 0.08  # Seconds for the pitch to close most of the gap to a new distance
+SYNTH_ATTACK = 0.02  # Seconds to fade a voice in
+SYNTH_RELEASE = 0.3  # Seconds to fade a voice out after note-off
+SYNTH_HOLD = 0.6  # Seconds without a reading before a voice is released
+
+# Note sound files
+ASSET_CACHE_DIR = os.path.join(DATA_DIR, "pcm_cache")  # Decoded samples, reused across restarts
+ASSET_WORKERS = 4  # Threads decoding sound files
+
+# Audio engine
+AUDIO_FREQUENCY = 44100  # Mixer sample rate
+AUDIO_CHANNELS = 2  # Mixer output channels (2 = stereo)
+AUDIO_BUFFER = 256  # Mixer buffer in samples; smaller means lower output latency
+AUDIO_VOICES = 16  # Mixer channels available for simultaneous sounds
+AUDIO_STREAM_CHANNELS = 8  # Extra mixer channels reserved for streaming synth voices
+EFFECT_SOUNDS = {
+    "success": "/home/egertonj/Music/result.wav",
+    "failure": "/home/egertonj/Music/failure.wav",
+}
 
 # Database settings
 DB_HOST = '192.168.0.93'
@@ -0,0 +1,36 @@
+import logging
+import time
+from collections import namedtuple
+import scheduler
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# offset: seconds from the start of the timeline
+# Actions run on the scheduler's timer thread, so they must not block; sounds and LED
+# publishes only queue their work
+Cue = namedtuple("Cue", ["offset", "action", "args"])
+
+def cue(offset, action, *args):
+    return Cue(offset, action, args)
+
+def _run(c):
+    try:
+        c.action(*c.args)
+    except Exception as e:
+        logger.error(f"Cue {c.action.__name__}{c.args} failed: {e}")
+
+def play_timeline(timeline):
+    """Schedule every cue at its offset from now and return at once.
+
+    Returns the timers, which can be cancelled to abort the rest of the timeline.
+    """
+    start = time.monotonic()
+    return [scheduler.call_at(start + c.offset, _run, c) for c in timeline]
+
+def cancel(timers):
+    for timer in timers:
+        timer.cancel()
+
+def duration(timeline):
+    return max((c.offset for c in timeline), default=0)
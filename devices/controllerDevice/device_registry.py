@@ -0,0 +1,97 @@
+import logging
+import re
+import threading
+import time
+import health
+from health import SENSOR, LED_STRIP
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Device names end in their number, e.g. distance_sensor12 or ledstrip3
+_DEVICE_NAME = re.compile(r"^(?P<kind>[a-z_]+?)(?P<id>\d+)$")
+DEVICE_KINDS = {
+    "distance_sensor": SENSOR,
+    "ledstrip": LED_STRIP,
+    "led_on": LED_STRIP,  # control/led_onN switches ledstripN on and off
+}
+DEVICE_NAMES = {SENSOR: "distance_sensor", LED_STRIP: "ledstrip"}  # Name a device is known by, whatever the topic
+# Topics the backend and controller publish to a device; seeing one is no sign the device exists
+ADDRESSED_PREFIXES = {"config", "control"}
+
+class Device:
+    __slots__ = ("kind", "device_id", "name", "discovered_at", "last_reading")
+
+    def __init__(self, kind, device_id, name):
+        self.kind = kind
+        self.device_id = device_id
+        self.name = name
+        self.discovered_at = time.time()
+        self.last_reading = None
+
+_devices = {}  # (kind, device_id) -> Device
+_routes = {}  # topic -> (handler, device), filled as topics are first seen
+_families = {}  # (topic prefix, device name prefix) -> handler
+_lock = threading.Lock()
+_UNSEEN = object()
+_started_at = time.time()
+
+def set_routes(exact, families):
+    """Install the dispatch table.
+
+    exact maps whole topics to handlers; families maps (topic prefix, device kind name),
+    e.g. ("ultrasonic", "distance_sensor"), to the handler for every device of that kind.
+    """
+    with _lock:
+        _routes.clear()
+        _routes.update({topic: (handler, None) for topic, handler in exact.items()})
+        _families.clear()
+        _families.update(families)
+
+def route(topic):
+    """Return (handler, device) for a topic, or None if nothing handles it."""
+    entry = _routes.get(topic, _UNSEEN)
+    if entry is _UNSEEN:
+        return _compile_route(topic)
+    return entry
+
+def _compile_route(topic):
+    prefix, _, name = topic.partition("/")
+    match = _DEVICE_NAME.match(name)
+    handler = match and _families.get((prefix, match["kind"]))
+    with _lock:
+        if not handler:
+            _routes[topic] = None  # Remember unhandled topics too
+            logger.debug(f"No handler for topic {topic}")
+            return None
+        kind, device_id = DEVICE_KINDS[match["kind"]], int(match["id"])
+        if prefix in ADDRESSED_PREFIXES:
+            device = _devices.get((kind, device_id)) or Device(kind, device_id, f"{DEVICE_NAMES[kind]}{device_id}")
+        else:
+            device = _discover(kind, device_id)
+        _routes[topic] = (handler, device)
+    return handler, device
+
+def _discover(kind, device_id):
+    # Caller holds _lock
+    device = _devices.get((kind, device_id))
+    if device is None:
+        name = f"{DEVICE_NAMES[kind]}{device_id}"
+        device = _devices[(kind, device_id)] = Device(kind, device_id, name)
+        health.track(kind, health_name(device))
+        logger.info(f"Discovered {kind} {device_id} ({name})")
+    return device
+
+def health_name(device):
+    """Key the health tracker uses: sensor number for sensors, strip name for LED strips."""
+    return device.device_id if device.kind == SENSOR else device.name
+
+def ids(kind):
+    return sorted(device_id for k, device_id in _devices if k == kind)
+
+def devices(kind):
+    return [device for (k, _), device in _devices.items() if k == kind]
+
+def last_sensor_activity():
+    """Time of the most recent reading from any sensor, or the registry start if none yet."""
+    return max((d.last_reading for d in devices(SENSOR) if d.last_reading), default=_started_at)
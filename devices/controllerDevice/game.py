@@ -1,97 +1,107 @@
 import random
-import websocket
-import json
 import logging
-from config import WS_SERVER_URL
+import threading
+import ws_client
+import snapshots
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-positions = []
-
-def fetch_game_length():
-    try:
-        ws = websocket.WebSocket()
-        ws.connect(WS_SERVER_URL)
-        payload = {"action": "fetchGameLength"}
-        ws.send(json.dumps(payload))
-        response = ws.recv()
-        response_data = json.loads(response)
-        ws.close()
-        if response_data.get("action") == "fetchGameLength" and "data" in response_data:
-            game_length_data = response_data["data"]
-            if game_length_data:
-                game_sequence_length = game_length_data[0].get("length", None)
-                if game_sequence_length is not None:
-                    print(f"Game Sequence Length: {game_sequence_length}")
-                    return game_sequence_length
-                else:
-                    logger.error("Game length data received but 'length' field is missing")
-                    return None
-            else:
-                logger.error("No game length data received")
-                return None
-        else:
-            logger.error("Failed to fetch game length")
-            return None
-    except Exception as e:
-        logger.error(f"Failed to fetch game length: {e}")
-        return None
-
-def fetch_all_positions():
-    global positions
-    try:
-        ws = websocket.WebSocket()
-        ws.connect(WS_SERVER_URL)
-        payload = {"action": "fetchAllPositions"}
-        ws.send(json.dumps(payload))
-        response = ws.recv()
-        response_data = json.loads(response)
-        ws.close()
-        if response_data.get("action") == "fetchAllPositions" and "data" in response_data:
-            positions = response_data["data"]
-            return positions
-        else:
-            logger.error("Failed to fetch positions")
+step_graph = {}  # (sensor_ID, range_ID) -> tuple of steps that may follow it
+game_length = None  # Cached sequence length, updated when the backend reports a change
+_pregenerated = {}  # First step -> sequence ready for the next round
+_listening = False
+
+# Range transitions allowed between consecutive steps
+ALLOWED_RANGE_TRANSITIONS = {1: {1, 2}, 2: {1, 2, 3}, 3: {2, 3}}
+
+def apply_game_length(rows):
+    """Take the length from fetchGameLength rows."""
+    global game_length
+    length = rows[0].get("length") if rows else None
+    if length is None:
+        logger.error("Game length data received but 'length' field is missing")
+        return
+    game_length = int(length)
+    _pregenerated.clear()
+    logger.info(f"Game sequence length: {game_length}")
+
+def build_step_graph(new_positions):
+    """Precompute the steps reachable from each position: neighbouring sensors and allowed range moves."""
+    global step_graph
+    by_sensor = {}
+    for pos in new_positions:
+        by_sensor.setdefault(pos['sensor_ID'], []).append(pos['range_ID'])
+    graph = {}
+    for pos in new_positions:
+        step = (pos['sensor_ID'], pos['range_ID'])
+        allowed = ALLOWED_RANGE_TRANSITIONS.get(step[1], ())
+        graph[step] = tuple(
+            (sensor_id, range_id)
+            for sensor_id in (step[0] - 1, step[0], step[0] + 1)
+            for range_id in by_sensor.get(sensor_id, ())
+            if range_id in allowed and (sensor_id, range_id) != step
+        )
+    step_graph = graph
+    _pregenerated.clear()
+    return graph
+
+def get_game_length():
+    """Return the cached game length, fetching it from the backend the first time."""
+    global _listening
+    if not _listening:
+        ws_client.client.add_listener(handle_backend_message)
+        _listening = True
+    if game_length is None:
+        snapshots.load_config("game_length", "fetchGameLength", apply_game_length)
+    return game_length
+
+def handle_backend_message(message):
+    global game_length
+    if message.get("action") == "gameLengthChanged":
+        length = (message.get("data") or {}).get("length")
+        game_length = int(length) if length is not None else None
+        _pregenerated.clear()
+        if game_length is not None:
+            snapshots.save("game_length", [{"length": game_length}])
+        logger.info(f"Game length changed to {game_length}")
+
+def _random_walk(first_step, length):
+    sequence = [first_step]
+    for _ in range(length - 1):
+        next_steps = step_graph.get(sequence[-1])
+        if not next_steps:
+            logger.error("Unable to generate sequence: no valid next steps found")
             return []
-    except Exception as e:
-        logger.error(f"Failed to fetch positions: {e}")
-        return []
+        sequence.append(random.choice(next_steps))
+    return sequence
 
-def generate_sequence_from_first_step(first_step, positions):
-    game_sequence_length = fetch_game_length()
+def generate_sequence_from_first_step(first_step):
+    game_sequence_length = get_game_length()
     if game_sequence_length is None:
         logger.error("Unable to generate sequence: game length is not available")
         return []
 
-    sequence = [first_step]
-    sensor_id, range_id = first_step
+    return _random_walk(first_step, game_sequence_length)
 
-    for _ in range(game_sequence_length - 1):
-        last_sensor_id, last_range_id = sequence[-1]
+def _refill(first_step):
+    sequence = generate_sequence_from_first_step(first_step)
+    if sequence:
+        _pregenerated[first_step] = sequence
 
-        next_steps = [pos for pos in positions if 
-                      pos['sensor_ID'] in {last_sensor_id - 1, last_sensor_id, last_sensor_id + 1} and
-                      pos['range_ID'] in ({1, 2} if last_range_id == 1 else {1, 2, 3} if last_range_id == 2 else {2, 3}) and
-                      (pos['sensor_ID'], pos['range_ID']) != (last_sensor_id, last_range_id)]
-
-        if not next_steps:
-            logger.error("Unable to generate sequence: no valid next steps found")
-            return []
-
-        next_step = random.choice(next_steps)
-        sequence.append((next_step['sensor_ID'], next_step['range_ID']))
+def take_sequence(first_step):
+    """Return a sequence starting at first_step, using a pre-generated one when available.
 
+    A replacement for the next round is generated in the background.
+    """
+    sequence = _pregenerated.pop(first_step, None)
+    if sequence is None:
+        sequence = generate_sequence_from_first_step(first_step)
+    threading.Thread(target=_refill, args=(first_step,), daemon=True).start()
     return sequence
 
-
-def map_position_id_to_sensor_range(position_id):
-    for position in positions:
-        if position["position_ID"] == position_id:
-            return position["sensor_ID"], position["range_ID"]
-    return None, None
-    
-    
-
-
-
+def pregenerate_sequences():
+    """Fill the pre-generated sequence pool for every possible first step."""
+    for step in list(step_graph):
+        if step not in _pregenerated:
+            _refill(step)
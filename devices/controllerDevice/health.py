@@ -0,0 +1,139 @@
+import logging
+import threading
+import time
+import ws_client
+import scheduler
+from config import HEALTH_TIMEOUTS, HEALTH_CHECK_INTERVAL, HEALTH_REPORT_WINDOW
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+SENSOR = "sensor"
+LED_STRIP = "led_strip"
+
+class Device:
+    __slots__ = ("kind", "name", "alive", "last_seen")
+
+    def __init__(self, kind, name):
+        self.kind = kind
+        self.name = name
+        self.alive = None  # Unknown until the device is heard from or times out
+        self.last_seen = time.time()
+
+_devices = {}  # (kind, name) -> Device
+_pending = {}  # (kind, name) -> alive, transitions waiting for the next report
+_reported = {}  # (kind, name) -> alive as last accepted by the backend
+_listeners = []
+_lock = threading.Lock()
+_report_timer = None
+_sweep_timer = None
+
+def add_listener(callback):
+    """Call callback(kind, name, alive) on every transition, outside the tracker's lock."""
+    _listeners.append(callback)
+
+def track(kind, name):
+    """Start watching a device that has not been heard from yet."""
+    with _lock:
+        if (kind, name) not in _devices:
+            _devices[(kind, name)] = Device(kind, name)
+
+def seen(kind, name):
+    """Record a sign of life; reports a transition if the device was dead or unknown."""
+    with _lock:
+        device = _devices.get((kind, name))
+        if device is None:
+            device = _devices[(kind, name)] = Device(kind, name)
+        device.last_seen = time.time()
+        if device.alive:
+            return
+        _transition(device, True)
+    _notify(kind, name, True)
+
+def is_alive(kind, name):
+    device = _devices.get((kind, name))
+    return bool(device and device.alive)
+
+def _transition(device, alive):
+    # Caller holds _lock
+    global _report_timer
+    device.alive = alive
+    key = (device.kind, device.name)
+    logger.info(f"{device.kind} {device.name} is now {'alive' if alive else 'dead'}")
+    if _reported.get(key) == alive:
+        _pending.pop(key, None)  # Flapped back before it was reported
+    else:
+        _pending[key] = alive
+    if _pending and _report_timer is None:
+        _report_timer = scheduler.call_later(HEALTH_REPORT_WINDOW, _report)
+
+def _notify(kind, name, alive):
+    for callback in _listeners:
+        try:
+            callback(kind, name, alive)
+        except Exception as e:
+            logger.error(f"Health listener {callback.__name__} failed: {e}")
+
+def _sweep():
+    global _sweep_timer
+    now = time.time()
+    died = []
+    with _lock:
+        for device in _devices.values():
+            if device.alive is not False and now - device.last_seen > HEALTH_TIMEOUTS[device.kind]:
+                _transition(device, False)
+                died.append(device)
+        _sweep_timer = scheduler.call_later(HEALTH_CHECK_INTERVAL, _sweep)
+    for device in died:
+        _notify(device.kind, device.name, False)
+
+def _report():
+    """Send every transition since the last report as one updateDeviceHealth request."""
+    global _report_timer
+    with _lock:
+        _report_timer = None
+        if not _pending:
+            return
+        changes = dict(_pending)
+        _pending.clear()
+        devices = list(_devices.values())
+    sensors = [d for d in devices if d.kind == SENSOR and d.alive is not None]
+    payload = {
+        "sensors": [{"sensor_ID": name, "alive": alive} for (kind, name), alive in changes.items() if kind == SENSOR],
+        "led_strips": [{"led_strip_name": name, "alive": alive} for (kind, name), alive in changes.items() if kind == LED_STRIP],
+    }
+    if payload["sensors"]:
+        # The backend keeps one alive flag for the sensors as a whole
+        payload["sensors_alive"] = all(d.alive for d in sensors)
+    # Waiting for the reply would hold up every other timer on the scheduler thread
+    ws_client.in_background(_send_report, changes, payload)
+
+def _send_report(changes, payload):
+    global _report_timer
+    response = ws_client.request("updateDeviceHealth", payload)
+    if response and "error" not in response:
+        logger.info(f"Reported {len(changes)} device health changes")
+        with _lock:
+            _reported.update(changes)
+        return
+    error = (response or {}).get("error", "no reply")
+    logger.warning(f"Failed to report device health ({error}); retrying with the next report")
+    with _lock:
+        for key, alive in changes.items():
+            _pending.setdefault(key, alive)
+        if _report_timer is None:
+            _report_timer = scheduler.call_later(HEALTH_CHECK_INTERVAL, _report)
+
+def start():
+    """Begin the periodic sweep for devices that have gone quiet."""
+    global _sweep_timer
+    with _lock:
+        if _sweep_timer is None:
+            _sweep_timer = scheduler.call_later(HEALTH_CHECK_INTERVAL, _sweep)
+
+def stop():
+    global _sweep_timer
+    with _lock:
+        if _sweep_timer is not None:
+            _sweep_timer.cancel()
+            _sweep_timer = None
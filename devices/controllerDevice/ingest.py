@@ -0,0 +1,98 @@
+import logging
+import queue
+import threading
+import time
+from collections import deque
+import metrics
+from config import INGEST_WORKERS, INGEST_QUEUE_DEPTH, INGEST_MAX_AGE
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Per-sensor reading queues; a full queue drops its oldest reading (latest wins)
+_queues = {}
+# Sensors queued for a worker or being processed, so each sensor is handled by one worker at a time
+_scheduled = set()
+_ready = queue.Queue()
+_lock = threading.Lock()
+_handler = None
+_workers = []
+
+stats = {"received": 0, "processed": 0, "coalesced": 0, "dropped": 0}
+
+QUEUE_SECONDS = metrics.histogram("staircase_stage_seconds", metrics.STAGE_HELP,
+                                  stage="ingest_queue")
+for _name in stats:
+    metrics.counter(f"staircase_ingest_{_name}_total", f"Readings {_name} by the ingest pipeline",
+                    read=lambda name=_name: stats[name])
+
+def submit(sensor_id, *reading):
+    """Queue a reading for processing; called from the MQTT callback and never blocks."""
+    with _lock:
+        stats["received"] += 1
+        if _handler is None:
+            stats["dropped"] += 1
+            return
+        readings = _queues.get(sensor_id)
+        if readings is None:
+            readings = _queues[sensor_id] = deque(maxlen=INGEST_QUEUE_DEPTH)
+        if len(readings) == INGEST_QUEUE_DEPTH:
+            stats["coalesced"] += 1
+        readings.append((time.time(), reading))
+        if sensor_id not in _scheduled:
+            _scheduled.add(sensor_id)
+            _ready.put(sensor_id)
+
+def _next_reading(sensor_id):
+    with _lock:
+        readings = _queues[sensor_id]
+        while readings:
+            received_at, reading = readings.popleft()
+            age = time.time() - received_at
+            if age <= INGEST_MAX_AGE:
+                QUEUE_SECONDS.observe(age)
+                return reading
+            stats["dropped"] += 1
+        _scheduled.discard(sensor_id)
+        return None
+
+def _release(sensor_id):
+    with _lock:
+        if _queues[sensor_id]:
+            _ready.put(sensor_id)
+        else:
+            _scheduled.discard(sensor_id)
+
+def _worker():
+    while True:
+        sensor_id = _ready.get()
+        if sensor_id is None:
+            return
+        reading = _next_reading(sensor_id)
+        if reading is None:
+            continue
+        try:
+            _handler(sensor_id, *reading)
+        except Exception as e:
+            logger.error(f"Failed to process reading from sensor {sensor_id}: {e}")
+        with _lock:
+            stats["processed"] += 1
+        _release(sensor_id)
+
+def start(handler, workers=INGEST_WORKERS):
+    """Start the worker pool that passes each submitted reading to handler(sensor_id, *reading)."""
+    global _handler
+    _handler = handler
+    for i in range(workers):
+        worker = threading.Thread(target=_worker, name=f"ingest-{i}", daemon=True)
+        worker.start()
+        _workers.append(worker)
+    logger.info(f"Ingest pipeline started with {workers} workers")
+
+def stop():
+    global _handler
+    _handler = None
+    for _ in _workers:
+        _ready.put(None)
+    _workers.clear()
+    logger.info(f"Ingest pipeline stopped: {stats}")
@@ -0,0 +1,108 @@
+import logging
+import threading
+import time
+import ws_client
+import scheduler
+import metrics
+from config import LED_TRIGGER_TOPIC, LED_CONFIG_TOPIC, LED_ON_TOPIC, LED_TRIGGER_QOS, LED_BATCH_WINDOW, LED_AUDIT_BACKEND
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+_client = None  # Connected paho client, set once MQTT is up
+_lock = threading.Lock()
+_batch = []  # (topic, frame, qos) waiting for the next flush
+_audit = []  # Published triggers not yet reported to the backend
+_flush_timer = None
+
+PUBLISH_SECONDS = metrics.histogram("staircase_stage_seconds", metrics.STAGE_HELP,
+                                    stage="led_publish")
+FALLBACKS = metrics.counter("staircase_led_backend_fallbacks_total", "LED triggers sent through the backend")
+
+def set_client(client):
+    global _client
+    _client = client
+
+def frame(led_range, color, duration):
+    """Build the range&color&duration payload understood by the LED strip firmware."""
+    return f"{led_range}&{color}&{duration}"
+
+def trigger(strip_id, message, qos=LED_TRIGGER_QOS, batch=False):
+    """Publish an LED frame straight to the strip's trigger topic.
+
+    Batched frames are held for LED_BATCH_WINDOW and published together.
+    Falls back to the backend's sendLEDTrigger while MQTT is not connected.
+    """
+    topic = f"{LED_TRIGGER_TOPIC}{strip_id}"
+    if _client is None or not _client.is_connected():
+        FALLBACKS.inc()
+        logger.debug(f"MQTT unavailable, sending LED trigger for strip {strip_id} through the backend")
+        return ws_client.send("sendLEDTrigger", {"sensor_id": strip_id, "message": message})
+    if batch:
+        with _lock:
+            _batch.append((topic, message, qos))
+            _schedule_flush()
+        return True
+    return _publish(topic, message, qos)
+
+def configure(led_strip_name, colours):
+    """Publish a strip's colour for each range, given as {range_name: "r,g,b"}.
+
+    Falls back to the backend's setLEDColors, which sends the stored colours, while MQTT is not connected.
+    """
+    if _client is None or not _client.is_connected():
+        FALLBACKS.inc()
+        return ws_client.send("setLEDColors", {"sensorName": led_strip_name})
+    topic = f"{LED_CONFIG_TOPIC}{led_strip_name}"
+    published = True
+    for range_name, rgb in colours.items():
+        result = _client.publish(topic, f"{range_name}&{rgb}", qos=1)
+        if result.rc != 0:
+            logger.error(f"Failed to publish {range_name} colour to {topic}: rc={result.rc}")
+            published = False
+    return published
+
+def hold(strip_id, message):
+    """Publish an r,g,b,on message that keeps a strip lit between triggers, or clears it."""
+    if _client is None or not _client.is_connected():
+        logger.warning(f"MQTT unavailable, cannot send LED on state to strip {strip_id}")
+        return False
+    result = _client.publish(f"{LED_ON_TOPIC}{strip_id}", message, qos=1)
+    if result.rc != 0:
+        logger.error(f"Failed to publish LED on state to strip {strip_id}: rc={result.rc}")
+        return False
+    return True
+
+def _publish(topic, message, qos):
+    started = metrics.clock()
+    result = _client.publish(topic, message, qos=qos)
+    PUBLISH_SECONDS.observe_since(started)
+    if result.rc != 0:
+        logger.error(f"Failed to publish LED trigger {message} to {topic}: rc={result.rc}")
+        return False
+    logger.debug(f"LED trigger {message} published to {topic}")
+    if LED_AUDIT_BACKEND:
+        with _lock:
+            _audit.append({"topic": topic, "message": message, "timestamp": time.time()})
+            _schedule_flush()
+    return True
+
+def _schedule_flush():
+    # Caller holds _lock
+    global _flush_timer
+    if _flush_timer is None:
+        _flush_timer = scheduler.call_later(LED_BATCH_WINDOW, flush)
+
+def flush():
+    global _flush_timer
+    with _lock:
+        frames = _batch[:]
+        del _batch[:]
+        _flush_timer = None
+    for topic, message, qos in frames:
+        _publish(topic, message, qos)
+    with _lock:
+        triggers = _audit[:]
+        del _audit[:]
+    if triggers:
+        ws_client.send("ledTriggerAudit", {"triggers": triggers})
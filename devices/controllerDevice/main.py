@@ -1,42 +1,58 @@
 import logging
 import os
-import time
-import threading
-from mqtt_handler import setup_mqtt_client, check_for_inactivity, check_for_alive_messages
-from sound import load_sounds, load_ranges
-
-# Set the logging level based on an environment variable
-log_level = os.getenv('LOG_LEVEL', 'INFO').upper()
-logging.basicConfig(level=getattr(logging, log_level))
+from mqtt_handler import setup_mqtt_client, start_watchdogs
+from sensor_data import fetch_and_play_note_details
+from config import STARTUP_READY_TIMEOUT
+import startup
+import ingest
+import scheduler
+import sensor_logger
+import metrics
+
 logger = logging.getLogger(__name__)
 
 def main():
+    # Set the logging level based on an environment variable
+    log_level = os.getenv('LOG_LEVEL', 'INFO').upper()
+    logging.basicConfig(level=getattr(logging, log_level))
     logger.debug("Starting main function")
 
-    # Load sounds and ranges from the server with retries
-    logger.debug("Loading sounds")
-    load_sounds()
-    logger.debug("Loading ranges")
-    load_ranges()
+    # Deadlines and delayed work run on a single timer thread
+    scheduler.start()
+
+    # Initialise audio and load the configuration from the server in parallel
+    logger.debug("Starting configuration loads")
+    startup.start()
+    if not startup.wait_ready(STARTUP_READY_TIMEOUT):
+        logger.warning("Configuration for the active mode is incomplete; starting anyway")
+
+    # Log readings to the backend in batches from a background thread
+    logger.debug("Starting sensor logger")
+    sensor_logger.start()
+
+    # Process sensor readings on worker threads so the MQTT loop never blocks
+    logger.debug("Starting ingest pipeline")
+    ingest.start(fetch_and_play_note_details)
 
     # Create and set up MQTT client
     logger.debug("Setting up MQTT client")
     client = setup_mqtt_client()
-    
-    # Start the thread to check for alive messages
-    logger.debug("Starting thread to check for alive messages")
-    threading.Thread(target=check_for_alive_messages, daemon=True).start()
 
-    # Start the MQTT loop to handle incoming messages
+    # Inactivity and device health deadlines
+    start_watchdogs()
+    metrics.start()
+
+    # Run the MQTT network loop; messages are dispatched as soon as they arrive
     try:
         logger.debug("Starting MQTT client loop")
-        while True:
-            client.loop()
-            check_for_inactivity(client)
-            time.sleep(1)
+        client.loop_forever()
     except KeyboardInterrupt:
         logger.info("MQTT client loop stopped by user.")
     finally:
+        metrics.stop()
+        scheduler.stop()
+        ingest.stop()
+        sensor_logger.stop()
         client.disconnect()
         logger.info("MQTT client disconnected.")
 
@@ -0,0 +1,177 @@
+import bisect
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import scheduler
+from config import METRICS_ENABLED, METRICS_HOST, METRICS_PORT, METRICS_FILE, METRICS_FILE_INTERVAL
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds, from sub-millisecond dispatch up to slow backend round trips
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+# Help text shared by every staircase_stage_seconds histogram
+STAGE_HELP = "Time spent in each stage of handling a reading"
+
+_enabled = METRICS_ENABLED
+_metrics = []  # Every metric in registration order, rendered grouped by name
+_server = None
+_file_timer = None
+
+def clock():
+    """Start time for a later observe_since(); free when metrics are disabled."""
+    return time.perf_counter() if _enabled else 0.0
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in sorted(labels.items())) + "}"
+
+class Counter:
+    """Monotonic count. Increments are not locked; a rare lost update is acceptable here."""
+
+    __slots__ = ("name", "help", "labels", "value", "read")
+    kind = "counter"
+
+    def __init__(self, name, help, labels=None, read=None):
+        self.name = name
+        self.help = help
+        self.labels = labels or {}
+        self.value = 0
+        self.read = read  # Callable returning the value, for counts a module already keeps
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def samples(self):
+        value = self.read() if self.read else self.value
+        yield self.name, self.labels, value
+
+class Gauge(Counter):
+    __slots__ = ()
+    kind = "gauge"
+
+    def set(self, value):
+        self.value = value
+
+class Histogram:
+    __slots__ = ("name", "help", "labels", "buckets", "counts", "sum", "count")
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=None, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels or {}
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # The last slot counts values above every bucket
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        if not _enabled:
+            return
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def observe_since(self, started):
+        """Observe the seconds elapsed since a clock() reading."""
+        if _enabled:
+            self.observe(time.perf_counter() - started)
+
+    def samples(self):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f"{self.name}_bucket", {**self.labels, "le": repr(bound)}, cumulative
+        yield f"{self.name}_bucket", {**self.labels, "le": "+Inf"}, self.count
+        yield f"{self.name}_sum", self.labels, self.sum
+        yield f"{self.name}_count", self.labels, self.count
+
+def _register(metric):
+    _metrics.append(metric)
+    return metric
+
+def counter(name, help, read=None, **labels):
+    return _register(Counter(name, help, labels, read))
+
+def gauge(name, help, read=None, **labels):
+    return _register(Gauge(name, help, labels, read))
+
+def histogram(name, help, buckets=DEFAULT_BUCKETS, **labels):
+    return _register(Histogram(name, help, labels, buckets))
+
+def enabled():
+    return _enabled
+
+def render():
+    """Return every metric in the Prometheus text exposition format."""
+    lines = []
+    described = set()
+    for metric in sorted(_metrics, key=lambda m: m.name):
+        if metric.name not in described:
+            described.add(metric.name)
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+        try:
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+        except Exception as e:
+            logger.error(f"Failed to collect metric {metric.name}: {e}")
+    return "\n".join(lines) + "\n"
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+def write_file(path=METRICS_FILE):
+    """Write the metrics to path, replacing it atomically so readers never see half a file."""
+    global _file_timer
+    try:
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(f"{path}.tmp", "w") as f:
+            f.write(render())
+        os.replace(f"{path}.tmp", path)
+    except OSError as e:
+        logger.error(f"Failed to write metrics to {path}: {e}")
+    _file_timer = scheduler.call_later(METRICS_FILE_INTERVAL, write_file, path)
+
+def start():
+    """Expose the metrics over HTTP and/or to a file, as configured; does nothing when disabled."""
+    global _server
+    if not _enabled:
+        return
+    if METRICS_PORT and _server is None:
+        try:
+            _server = ThreadingHTTPServer((METRICS_HOST, METRICS_PORT), _Handler)
+        except OSError as e:
+            logger.error(f"Failed to start metrics endpoint on {METRICS_HOST}:{METRICS_PORT}: {e}")
+        else:
+            threading.Thread(target=_server.serve_forever, name="metrics", daemon=True).start()
+            logger.info(f"Serving metrics on http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+    if METRICS_FILE and _file_timer is None:
+        write_file()
+        logger.info(f"Writing metrics to {METRICS_FILE} every {METRICS_FILE_INTERVAL} seconds")
+
+def stop():
+    global _server, _file_timer
+    if _server is not None:
+        _server.shutdown()
+        _server = None
+    if _file_timer is not None:
+        _file_timer.cancel()
+        _file_timer = None
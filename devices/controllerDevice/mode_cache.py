@@ -0,0 +1,63 @@
+import logging
+import threading
+import time
+import ws_client
+from config import MODE_CACHE_TTL
+import snapshots
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Locally cached active mode, kept current by backend pushes
+_mode = None
+_fetched_at = 0
+_refreshing = threading.Lock()
+
+def set_mode(mode_id):
+    global _mode, _fetched_at
+    if mode_id != _mode:
+        logger.info(f"Active mode changed: {_mode} -> {mode_id}")
+    _mode = mode_id
+    _fetched_at = time.time()
+
+def apply_mode(data):
+    if data.get("mode_ID") is not None:
+        set_mode(data["mode_ID"])
+
+def refresh():
+    """Fetch the active mode from the backend and store it."""
+    global _fetched_at
+    if not _refreshing.acquire(blocking=False):
+        return _mode  # Another thread is already refreshing
+    try:
+        if snapshots.refresh("active_mode", "fetchActiveMode", apply_mode):
+            _fetched_at = time.time()  # Fresh again even when the mode, and so the snapshot, is unchanged
+        return _mode
+    finally:
+        _refreshing.release()
+
+def cached_mode():
+    """Return the cached mode, or None, without ever going to the backend."""
+    return _mode
+
+def get_mode():
+    """Return the active mode without touching the backend unless the cache is empty.
+
+    A stale entry is still returned while it is revalidated in the background.
+    """
+    if _mode is None:
+        return refresh()
+    if time.time() - _fetched_at > MODE_CACHE_TTL and not _refreshing.locked():
+        threading.Thread(target=refresh, daemon=True).start()
+    return _mode
+
+def handle_backend_message(message):
+    if message.get("action") == "activeModeChanged":
+        mode_id = (message.get("data") or {}).get("mode_ID")
+        if mode_id is not None:
+            set_mode(int(mode_id))
+            snapshots.save("active_mode", {"mode_ID": int(mode_id)})
+
+def init():
+    ws_client.client.add_listener(handle_backend_message)
+    snapshots.load_config("active_mode", "fetchActiveMode", apply_mode)
@@ -2,18 +2,24 @@ import paho.mqtt.client as mqtt
 import logging
 import time
 import threading
-import websocket
-import json
-from sensor_data import fetch_and_play_note_details
+import ws_client
+import ingest
+import conditioning
+import scheduler
+import led_output
+import health
+import device_registry
+import metrics
+import snapshots
+import sound
+import rate_limit
 from config import (
     MQTT_BROKER, MQTT_PORT, MQTT_TOPICS, MQTT_MUTE_TOPIC, CONTROL_TOPIC,
-    MOTION_CONTROL_TOPIC, CONFIG_RANGE_TOPIC, CONFIG_TOPICS, WS_SERVER_URL, CONFIG_LED_ON_TOPICS
+    MOTION_CONTROL_TOPIC, CONFIG_RANGE_TOPIC, CONFIG_TOPICS, CONFIG_LED_ON_TOPICS
 )
-from utils import retry_request
 
 # Configure logging
 logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.INFO)
 
 # Mute state
 is_muted = False
@@ -21,160 +27,62 @@ NUM_LEDS = 31
 
 # Timeout period for ultrasonic sensors to sleep (in seconds)
 TIMEOUT_PERIOD = 300  # 5 minutes
-ALIVE_CHECK_PERIOD = 60  # Period to check for alive messages (in seconds)
 
-# Dictionary to track the last activity time for each ultrasonic sensor
-last_activity = {sensor_id: time.time() for sensor_id in range(1, 5)}
+# Deadline timer on the shared scheduler
+_inactivity_timer = None
+_timer_lock = threading.Lock()
+_mqtt_client = None
+_led_on = {}  # LED strip name -> (strip number, last r,g,b,on message), replayed when a strip restarts
 
-# Dictionary to track the last activity time for each LED strip
-led_strip_last_activity = {f"ledstrip{i}": time.time() for i in range(1, 3)}  # Update based on actual LED strips
-
-def update_sensor_alive(sensors_on):
-    payload = {"sensors_on": sensors_on}
-    logger.debug(f"Updating sensor alive status with payload: {payload}")
-    try:
-        ws = websocket.WebSocket()
-        ws.connect(WS_SERVER_URL)
-        ws_payload = {"action": "updateSensorAlive", "payload": payload}
-        ws.send(json.dumps(ws_payload))
-        response = ws.recv()
-        response_data = json.loads(response)
-        logger.debug(f"Received response for updateSensorAlive: {response_data}")
-        if response_data.get("action") == "update_sensor_status" and "error" not in response_data:
-            logger.info(f"Sensor alive status updated successfully: {payload}")
-        else:
-            logger.error(f"Failed to update sensor alive status: {response_data.get('error')}")
-        ws.close()
-    except websocket.WebSocketException as e:
-        logger.error(f"WebSocket error: {e}")
-    except json.JSONDecodeError as e:
-        logger.error(f"JSON decode error: {e} - Response content: {response}")
-    except Exception as e:
-        logger.error(f"Failed to send data to server: {e}")
+DISPATCH_SECONDS = metrics.histogram("staircase_stage_seconds", metrics.STAGE_HELP,
+                                     stage="mqtt_dispatch")
 
 def update_sensor_status(sensors_on):
     payload = {"sensors_on": sensors_on}
     try:
-        ws = websocket.WebSocket()
-        ws.connect(WS_SERVER_URL)
-        ws_payload = {"action": "updateSensorStatus", "payload": payload}
-        ws.send(json.dumps(ws_payload))
-        response = ws.recv()
-        response_data = json.loads(response)
+        response_data = ws_client.request("updateSensorStatus", payload) or {}
         logger.debug(f"Received response for updateSensorStatus: {response_data}")
         if response_data.get("action") == "update_sensor_status" and "error" not in response_data:
             logger.info(f"Sensor status updated successfully: {payload}")
         else:
             logger.error(f"Failed to update sensor status: {response_data.get('error')}")
-        ws.close()
-    except websocket.WebSocketException as e:
-        logger.error(f"WebSocket error: {e}")
-    except json.JSONDecodeError as e:
-        logger.error(f"JSON decode error: {e} - Response content: {response}")
     except Exception as e:
         logger.error(f"Failed to send data to server: {e}")
 
-def update_led_strip_status(led_strip_name, alive=None, mqtt_client=None):
-    payload = {
-        "led_strip_name": led_strip_name,
-        "alive": alive,
-        "active": alive
-    }
-    try:
-        ws = websocket.WebSocket()
-        ws.connect(WS_SERVER_URL)
-        ws_payload = {
-            "action": "updateLedStripStatus",
-            "payload": payload
-        }
-        ws.send(json.dumps(ws_payload))
-        response = ws.recv()
-        response_data = json.loads(response)
-        logger.debug(f"Received response for updateLedStripStatus: {response_data}")
-        if response_data.get("action") == "updateLedStripStatus" and "error" not in response_data:
-            logger.info(f"LED strip status updated successfully for {led_strip_name}: {payload}")
-            # If the LED strip is alive, send configuration messages
-            if alive:
-                send_config_messages(ws, led_strip_name)
-        else:
-            error_msg = response_data.get('error', 'Unknown error')
-            logger.error(f"Failed to update LED strip status for {led_strip_name}: {error_msg}")
-        ws.close()
-    except websocket.WebSocketException as e:
-        logger.error(f"WebSocket error: {e}")
-    except json.JSONDecodeError as e:
-        logger.error(f"JSON decode error: {e} - Response content: {response}")
-    except Exception as e:
-        logger.error(f"Failed to send data to server: {e}")
+def handle_health_change(kind, name, alive):
+    # A strip that comes back has lost its colours and on state, so replay them once per revival
+    if kind == health.LED_STRIP and alive:
+        threading.Thread(target=send_config_messages, args=(name,), daemon=True).start()
+        if name in _led_on:
+            led_output.hold(*_led_on[name])
 
 
 
-def send_config_messages(ws, led_strip_name):
-    try:
-        # Request range limits
-        ws_payload = {"action": "getRangeLimits"}
-        ws.send(json.dumps(ws_payload))
-        response = ws.recv()
-        response_data = json.loads(response)
-        if response_data.get("action") == "getRangeLimits" and "error" not in response_data:
-            closeUpperLimit = response_data["data"]["closeUpperLimit"]
-            midUpperLimit = response_data["data"]["midUpperLimit"]
-            logger.info(f"Received range limits: close={closeUpperLimit}, mid={midUpperLimit}")
+RANGE_NAMES = {1: "close", 2: "mid", 3: "far"}  # Range names understood by the LED strip firmware
+RANGE_IDS = {name: range_ID for range_ID, name in RANGE_NAMES.items()}
 
-        else:
-            logger.error(f"Failed to fetch range limits: {response_data.get('error')}")
-
-        # Request LED color configuration
-        ws_payload = {
-            "action": "determineLEDColor",
-            "payload": {"sensorName": led_strip_name}
-        }
-        ws.send(json.dumps(ws_payload))
-        response = ws.recv()
-        response_data = json.loads(response)
-        if response_data.get("action") == "determineLEDColor" and "error" not in response_data:
-            colors = response_data["data"]
-            for color in colors:
-                red = color["red"]
-                green = color["green"]
-                blue = color["blue"]
-                range_ID = color["range_ID"]
-                range_name = ""
-                if range_ID == 1:
-                    range_name = "close"
-                elif range_ID == 2:
-                    range_name = "mid"
-                elif range_ID == 3:
-                    range_name = "far"
-                logger.info(f"Received LED color configuration: range_name={range_name}, red={red}, green={green}, blue={blue}")
-                # Directly send LED color configuration via WebSocket
-                color_message = {
-                    "action": "setLEDColors",
-                    "payload": {
-                        "sensorName": led_strip_name,
-                        "range": range_name,
-                        "red": red,
-                        "green": green,
-                        "blue": blue
-                    }
-                }
-                ws.send(json.dumps(color_message))
-        else:
-            logger.error(f"Failed to fetch LED color configuration: {response_data.get('error')}")
+def apply_led_colours(led_strip_name, colours):
+    """Send a strip its colours from determineLEDColor rows."""
+    settings = {}
+    for color in colours:
+        range_name = RANGE_NAMES.get(color["range_ID"])
+        if range_name is None:
+            continue
+        settings[range_name] = f"{color['red']},{color['green']},{color['blue']}"
+        logger.info(f"LED color configuration for {led_strip_name}: range_name={range_name}, "
+                    f"red={color['red']}, green={color['green']}, blue={color['blue']}")
+    led_output.configure(led_strip_name, settings)
 
-    except websocket.WebSocketException as e:
-        logger.error(f"WebSocket error: {e}")
-    except json.JSONDecodeError as e:
-        logger.error(f"JSON decode error: {e} - Response content: {response}")
+def send_config_messages(led_strip_name):
+    try:
+        # The last-known colours are sent at once, then corrected if the backend has newer ones
+        snapshots.load_config(f"led_colours/{led_strip_name}", "determineLEDColor",
+                              lambda colours: apply_led_colours(led_strip_name, colours),
+                              {"sensorName": led_strip_name})
     except Exception as e:
         logger.error(f"Failed to send config messages: {e}")
 
 
-
-
-
-
-
 def on_connect(client, userdata, flags, rc):
     if rc == 0:
         logger.info("Connected to MQTT broker successfully")
@@ -182,89 +90,135 @@ def on_connect(client, userdata, flags, rc):
             client.subscribe(topic)
             logger.info(f"Subscribed to topic: {topic}")
         client.subscribe(MQTT_MUTE_TOPIC)
-        client.subscribe(CONTROL_TOPIC)
         logger.info(f"Subscribed to mute topic: {MQTT_MUTE_TOPIC}")
-        logger.info(f"Subscribed to control topic: {CONTROL_TOPIC}")
+        # Config published to the devices is applied here too, so no restart or reload is needed
+        config_topics = CONFIG_TOPICS + CONFIG_LED_ON_TOPICS
+        for topic in config_topics:
+            client.subscribe(topic)
+        logger.info(f"Subscribed to config topics: {config_topics}")
+        # An overlapping subscription would have the broker deliver each message twice
+        if not any(mqtt.topic_matches_sub(sub, CONTROL_TOPIC) for sub in config_topics):
+            client.subscribe(CONTROL_TOPIC)
+            logger.info(f"Subscribed to control topic: {CONTROL_TOPIC}")
     else:
         logger.error(f"Failed to connect to MQTT broker, return code {rc}")
 
-def on_message(client, userdata, message):
+def handle_mute(client, device, payload):
     global is_muted
+    is_muted = payload.lower() == 'mute'
+    logger.info(f"Mute state changed: {'Muted' if is_muted else 'Unmuted'}")
+
+def handle_control(client, device, payload):
+    sensors_on = payload.lower() == "wake"
+    logger.info(f"Setting all sensors to {'awake' if sensors_on else 'sleep'}")
+    ws_client.in_background(update_sensor_status, sensors_on)  # Keeps the MQTT loop free of backend waits
+    client.publish(MOTION_CONTROL_TOPIC, "wake" if sensors_on else "sleep")
+
+def handle_distance(client, device, payload):
+    distance = float(payload)
+    if distance == 0:
+        return  # Ignore erroneous reading of 0
+    sensor_id = device.device_id
+    reading = conditioning.condition(sensor_id, distance, is_muted)
+    if reading is not None:
+        filtered, range_id = reading
+        # Redundant triggers are dropped here, before any lookup or backend traffic
+        if is_muted or range_id is None or rate_limit.admit(sensor_id, range_id):
+            # Processed off the MQTT network loop; the raw distance is kept for the sensor log
+            ingest.submit(sensor_id, filtered, is_muted, range_id, distance)
+    record_sensor_activity(device)  # Update the last activity time
+
+def handle_alive(client, device, payload):
+    alive = payload.lower() == "alive"
+    logger.debug(f"Alive message for {device.kind} {device.name}, alive={alive}")
+    if alive:
+        health.seen(device.kind, device_registry.health_name(device))
+
+def handle_range_config(client, device, payload):
+    close_upper, mid_upper = (int(limit) for limit in payload.split(","))
+    sound.update_range_limits(close_upper, mid_upper)
+
+def handle_led_colour(client, device, payload):
+    """Fold a range&r,g,b colour into the strip's stored colours, so revivals replay the new one."""
+    range_name, rgb = payload.split("&")
+    red, green, blue = (int(value) for value in rgb.split(","))
+    name = f"led_colours/{device.name}"
+    colours = [c for c in snapshots.load(name) or [] if c["range_ID"] != RANGE_IDS[range_name]]
+    colours.append({"range_ID": RANGE_IDS[range_name], "red": red, "green": green, "blue": blue})
+    colours.sort(key=lambda c: c["range_ID"])
+    if snapshots.save(name, colours):
+        logger.info(f"LED colour for {device.name} {range_name} range changed to {rgb}")
+
+def handle_led_on(client, device, payload):
+    _led_on[device.name] = (device.device_id, payload)
+    logger.info(f"LED on state for {device.name} changed to {payload}")
+
+def install_routes():
+    device_registry.set_routes(
+        {MQTT_MUTE_TOPIC: handle_mute, CONTROL_TOPIC: handle_control, CONFIG_RANGE_TOPIC: handle_range_config},
+        {
+            ("ultrasonic", "distance_sensor"): handle_distance,
+            ("alive", "distance_sensor"): handle_alive,
+            ("alive", "ledstrip"): handle_alive,
+            ("config", "ledstrip"): handle_led_colour,
+            ("control", "led_on"): handle_led_on,
+        },
+    )
+
+def on_message(client, userdata, message):
     topic = message.topic
     logger.debug(f"Received message on topic: {topic} with payload: {message.payload}")
 
-    if topic == MQTT_MUTE_TOPIC:
-        is_muted = message.payload.decode().lower() == 'mute'
-        logger.info(f"Mute state changed: {'Muted' if is_muted else 'Unmuted'}")
+    entry = device_registry.route(topic)
+    if entry is None:
         return
-
+    handler, device = entry
+    started = metrics.clock()
     try:
-        payload = message.payload.decode()
-        logger.debug(f"Decoded payload: {payload}")
-        
-        if topic.startswith("ultrasonic/distance_sensor"):
-            distance = float(payload)
-            if distance == 0:
-                return  # Ignore erroneous reading of 0
-            sensor_id = int(topic.split("_")[-1][-1])  # Ensure the extraction is correct
-            fetch_and_play_note_details(sensor_id, distance, is_muted)
-            last_activity[sensor_id] = time.time()  # Update the last activity time
-            
-        elif topic.startswith("alive/distance_sensor"):
-            sensor_id = int(topic.split("_")[-1][-1])
-            active = payload.lower() == "alive"
-            logger.debug(f"Alive message for sensor_id={sensor_id}, active={active}")
-            last_activity[sensor_id] = time.time()  # Update the last alive time
-            update_sensor_status(active)
-            
-        elif topic.startswith("alive/ledstrip"):
-            led_strip_name = topic.split("/")[-1]
-            alive = payload.lower() == "alive"
-            logger.debug(f"Alive message for LED strip: led_strip_name={led_strip_name}, alive={alive}")
-            led_strip_last_activity[led_strip_name] = time.time()  # Update the last alive time
-            update_led_strip_status(led_strip_name, alive=alive, mqtt_client=client)
-            
-        elif topic == CONTROL_TOPIC:
-            sensors_on = payload.lower() == "wake"
-            logger.info(f"Setting all sensors to {'awake' if sensors_on else 'sleep'}")
-            update_sensor_status(sensors_on)
-            client.publish(MOTION_CONTROL_TOPIC, "wake" if sensors_on else "sleep")
-                    
+        handler(client, device, message.payload.decode())
+        DISPATCH_SECONDS.observe_since(started)
     except ValueError as e:
         logger.error(f"Failed to decode message payload: {e}")
     except Exception as e:
         logger.error(f"Unexpected error in on_message: {e}")
 
 
-def check_for_inactivity(client):
-    current_time = time.time()
-    all_inactive = True  # Flag to check if all sensors are inactive
-
-    for sensor_id, last_time in last_activity.items():
-        if current_time - last_time < TIMEOUT_PERIOD:
-            all_inactive = False  # If any sensor is active, set flag to False
-            break  # No need to check further, as we found an active sensor
-
-    if all_inactive:
-        logger.info(f"All sensors have been inactive for {TIMEOUT_PERIOD} seconds. Sending sleep command.")
-        client.publish(CONTROL_TOPIC, "sleep")
-        client.publish(MOTION_CONTROL_TOPIC, "motion_wake")
-
-def check_for_alive_messages():
-    while True:
-        current_time = time.time()
-        for sensor_id, last_time in last_activity.items():
-            if current_time - last_time >= ALIVE_CHECK_PERIOD:
-                logger.info(f"Sensor {sensor_id} has not sent an alive message for {ALIVE_CHECK_PERIOD} seconds. Marking as inactive.")
-                update_sensor_alive(False)
-        for led_strip_name, last_time in led_strip_last_activity.items():
-            if current_time - last_time >= ALIVE_CHECK_PERIOD:
-                logger.info(f"LED strip {led_strip_name} has not sent an alive message for {ALIVE_CHECK_PERIOD} seconds. Marking as inactive.")
-                update_led_strip_status(led_strip_name, alive=False)
-        time.sleep(ALIVE_CHECK_PERIOD)
+def record_sensor_activity(device):
+    device.last_reading = time.time()
+    health.seen(health.SENSOR, device.device_id)
+    with _timer_lock:
+        if _inactivity_timer is None and _mqtt_client is not None:
+            _arm_inactivity_timer()
+
+def _arm_inactivity_timer():
+    global _inactivity_timer
+    deadline = device_registry.last_sensor_activity() + TIMEOUT_PERIOD
+    _inactivity_timer = scheduler.call_later(deadline - time.time(), check_for_inactivity)
+
+def check_for_inactivity():
+    global _inactivity_timer
+    with _timer_lock:
+        if time.time() - device_registry.last_sensor_activity() < TIMEOUT_PERIOD:
+            _arm_inactivity_timer()  # Activity since the timer was set; wait for the new deadline
+            return
+        _inactivity_timer = None  # Re-armed by the next reading
+
+    logger.info(f"All sensors have been inactive for {TIMEOUT_PERIOD} seconds. Sending sleep command.")
+    _mqtt_client.publish(CONTROL_TOPIC, "sleep")
+    _mqtt_client.publish(MOTION_CONTROL_TOPIC, "motion_wake")
+
+def start_watchdogs():
+    """Arm the inactivity deadline and start tracking device health."""
+    _arm_inactivity_timer()
+    health.add_listener(handle_health_change)
+    health.start()
 
 def setup_mqtt_client():
+    global _mqtt_client
     client = mqtt.Client(client_id="", clean_session=True, userdata=None, protocol=mqtt.MQTTv311)
+    _mqtt_client = client
+    led_output.set_client(client)
+    install_routes()
     client.on_connect = on_connect
     client.on_message = on_message
     client.connect(MQTT_BROKER, MQTT_PORT)
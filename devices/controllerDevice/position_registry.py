@@ -0,0 +1,43 @@
+import logging
+import snapshots
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# (rows, position_ID -> (sensor_ID, range_ID), (sensor_ID, range_ID) -> position_ID)
+# Replaced as a whole so readers always see a consistent set of indexes
+_index = ([], {}, {})
+_listeners = []
+
+def add_listener(callback):
+    """Call callback(rows) whenever the positions are replaced."""
+    _listeners.append(callback)
+
+def set_positions(rows):
+    global _index
+    forward = {row["position_ID"]: (row["sensor_ID"], row["range_ID"]) for row in rows}
+    reverse = {step: position_id for position_id, step in forward.items()}
+    _index = (list(rows), forward, reverse)
+    logger.info(f"Position registry loaded with {len(rows)} positions")
+    for callback in _listeners:
+        try:
+            callback(rows)
+        except Exception as e:
+            logger.error(f"Position listener {callback.__name__} failed: {e}")
+
+def load():
+    """Apply the stored positions, then revalidate them with the backend.
+
+    Keeps the current positions if the backend cannot be reached.
+    """
+    return snapshots.load_config("positions", "fetchAllPositions", set_positions)
+
+def all_positions():
+    return _index[0]
+
+def sensor_range(position_id):
+    """Return (sensor_ID, range_ID) for a position, or (None, None) if it is unknown."""
+    return _index[1].get(position_id, (None, None))
+
+def position_id(sensor_id, range_id):
+    return _index[2].get((sensor_id, range_id))
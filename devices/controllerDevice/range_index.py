@@ -0,0 +1,55 @@
+import bisect
+import logging
+import numpy as np
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+NO_RANGE = -1  # Returned by classify() for distances outside every range
+
+class RangeIndex:
+    """Sorted range boundaries compiled from the getRanges rows for bisect lookups.
+
+    Instances are immutable; reloading ranges builds a new index and swaps it in.
+    """
+
+    __slots__ = ("lowers", "uppers", "ids", "_bounds", "_np_lowers", "_np_uppers", "_np_ids")
+
+    def __init__(self, ranges):
+        rows = sorted(ranges, key=lambda r: r["lower_limit"])
+        for previous, current in zip(rows, rows[1:]):
+            if current["lower_limit"] < previous["upper_limit"]:
+                logger.warning(f"Ranges {previous['range_ID']} and {current['range_ID']} overlap; "
+                               f"range {current['range_ID']} takes precedence from {current['lower_limit']}")
+        self.lowers = tuple(float(r["lower_limit"]) for r in rows)
+        self.uppers = tuple(float(r["upper_limit"]) for r in rows)
+        self.ids = tuple(r["range_ID"] for r in rows)
+        self._bounds = dict(zip(self.ids, zip(self.lowers, self.uppers)))
+        self._np_lowers = np.array(self.lowers, dtype=np.float64)
+        self._np_uppers = np.array(self.uppers, dtype=np.float64)
+        self._np_ids = np.array(self.ids, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def lookup(self, distance):
+        """Return the range_ID containing distance, or None."""
+        i = bisect.bisect_right(self.lowers, distance) - 1
+        if i >= 0 and distance < self.uppers[i]:
+            return self.ids[i]
+        return None
+
+    def contains(self, range_id, distance, margin=0.0):
+        """Whether distance lies within range_id widened by margin on both sides."""
+        bounds = self._bounds.get(range_id)
+        return bounds is not None and bounds[0] - margin <= distance < bounds[1] + margin
+
+    def classify(self, distances):
+        """Return an array of range_IDs for a batch of distances, NO_RANGE where none match."""
+        distances = np.asarray(distances, dtype=np.float64)
+        if not self.ids:
+            return np.full(distances.shape, NO_RANGE, dtype=np.int64)
+        i = np.searchsorted(self._np_lowers, distances, side="right") - 1
+        clipped = np.clip(i, 0, None)
+        matched = (i >= 0) & (distances < self._np_uppers[clipped])
+        return np.where(matched, self._np_ids[clipped], NO_RANGE)
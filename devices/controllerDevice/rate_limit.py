@@ -0,0 +1,69 @@
+import logging
+import threading
+import time
+import metrics
+import mode_cache
+import sound
+from config import RATE_LIMITS
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+SENSOR = "sensor"
+NOTE = "note"
+
+class TokenBucket:
+    """Allows rate triggers per second on average, with up to burst at once."""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = now
+
+    def available(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return self.tokens >= 1
+
+    def take(self):
+        self.tokens -= 1
+
+_buckets = {}  # (SENSOR, sensor_ID) or (NOTE, note_ID) -> TokenBucket
+_lock = threading.Lock()
+
+LIMITED = {kind: metrics.counter("staircase_rate_limited_total", "Readings dropped by the note trigger rate limits",
+                                 limit=kind) for kind in (SENSOR, NOTE)}
+
+def _bucket(kind, key, policy, now):
+    # Caller holds _lock
+    bucket = _buckets.get((kind, key))
+    if bucket is None or (bucket.rate, bucket.burst) != policy:
+        bucket = _buckets[(kind, key)] = TokenBucket(*policy, now)
+    return bucket
+
+def admit(sensor_id, range_id):
+    """Whether a reading may trigger a note under the active mode's limits; takes its tokens if so.
+
+    Uses only local state, so it is cheap enough to run on the MQTT thread before a reading is queued.
+    """
+    policies = RATE_LIMITS.get(mode_cache.cached_mode())
+    if not policies:
+        return True
+    now = time.monotonic()
+    keys = {SENSOR: sensor_id, NOTE: sound.note_map.get((sensor_id, range_id))}
+    with _lock:
+        buckets = [
+            (kind, _bucket(kind, keys[kind], policy, now))
+            for kind, policy in policies.items() if keys[kind] is not None
+        ]
+        for kind, bucket in buckets:
+            if not bucket.available(now):
+                LIMITED[kind].inc()
+                logger.debug(f"Rate limited sensor {sensor_id} at range {range_id} by its {kind} limit")
+                return False
+        for _, bucket in buckets:
+            bucket.take()
+    return True
@@ -0,0 +1,73 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+class Timer:
+    __slots__ = ("when", "callback", "args", "cancelled")
+
+    def __init__(self, when, callback, args):
+        self.when = when
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+# Heap of (when, sequence, timer); the sequence keeps ordering stable for equal deadlines
+_heap = []
+_counter = itertools.count()
+_condition = threading.Condition()
+_thread = None
+_running = False
+
+def call_at(when, callback, *args):
+    """Run callback(*args) on the scheduler thread at the given time.monotonic() deadline.
+
+    Callbacks must be quick; hand anything that blocks to another thread.
+    """
+    timer = Timer(when, callback, args)
+    with _condition:
+        heapq.heappush(_heap, (when, next(_counter), timer))
+        if _heap[0][2] is timer:
+            _condition.notify()
+    return timer
+
+def call_later(delay, callback, *args):
+    return call_at(time.monotonic() + delay, callback, *args)
+
+def _run():
+    while True:
+        with _condition:
+            while _running and (not _heap or _heap[0][0] > time.monotonic()):
+                timeout = _heap[0][0] - time.monotonic() if _heap else None
+                _condition.wait(timeout)
+            if not _running:
+                return
+            _, _, timer = heapq.heappop(_heap)
+        if timer.cancelled:
+            continue
+        try:
+            timer.callback(*timer.args)
+        except Exception as e:
+            logger.error(f"Scheduled callback {timer.callback.__name__} failed: {e}")
+
+def start():
+    global _thread, _running
+    with _condition:
+        if _running:
+            return
+        _running = True
+    _thread = threading.Thread(target=_run, name="scheduler", daemon=True)
+    _thread.start()
+
+def stop():
+    global _running
+    with _condition:
+        _running = False
+        _condition.notify()
@@ -0,0 +1,129 @@
+import logging
+import threading
+import ws_client
+import position_registry
+import snapshots
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Results of feeding a step to the automaton
+ADVANCED = "advanced"
+MATCHED = "matched"
+FAILED = "failed"
+
+class _Node:
+    __slots__ = ("children", "sequence_ids", "depth")
+
+    def __init__(self, depth):
+        self.children = {}  # (sensor_ID, range_ID) -> _Node
+        self.sequence_ids = []  # Sequences that are complete at this node
+        self.depth = depth
+
+def sequence_steps(sequence):
+    """Return the stepN_position_ID values of a security_sequence row in order."""
+    steps = []
+    while f"step{len(steps) + 1}_position_ID" in sequence:
+        steps.append(sequence[f"step{len(steps) + 1}_position_ID"])
+    return steps
+
+def compile_sequences(sequences, resolve_position=position_registry.sensor_range):
+    """Build a prefix automaton over (sensor_ID, range_ID) steps for every sequence.
+
+    Sharing prefixes lets all sequences be tracked at once with one dict lookup per step.
+    """
+    root = _Node(0)
+    for sequence in sequences:
+        node = root
+        steps = [resolve_position(position_id) for position_id in sequence_steps(sequence)]
+        if not steps or (None, None) in steps:
+            logger.warning(f"Skipping security sequence with unknown positions: {sequence}")
+            continue
+        for step in steps:
+            node = node.children.setdefault(step, _Node(node.depth + 1))
+        node.sequence_ids.append(sequence.get("sequence_ID"))
+    return root
+
+_root = _Node(0)
+_node = _root
+_last_step = None
+_loaded = False
+_sequences = []
+_lock = threading.Lock()
+
+def set_sequences(sequences):
+    """Swap in a freshly compiled automaton for the given sequences."""
+    global _sequences
+    _sequences = sequences
+    recompile()
+
+def load_sequences():
+    """Load the configured sequences from the snapshot, revalidating them with the backend."""
+    global _loaded
+    if not _loaded:
+        ws_client.client.add_listener(handle_backend_message)
+    snapshots.load_config("security_sequences", "fetchAllSecuritySequences", set_sequences)
+    _loaded = True
+
+def refresh_sequences():
+    snapshots.refresh("security_sequences", "fetchAllSecuritySequences", set_sequences)
+
+def recompile(*_):
+    """Rebuild the automaton from the cached sequences, e.g. after the positions change."""
+    global _root, _node
+    root = compile_sequences(_sequences)
+    with _lock:
+        _root = _node = root
+    logger.info(f"Compiled {len(_sequences)} security sequences")
+
+def _with_int_ids(sequence):
+    # The app sends IDs from form fields, so pushed sequences may carry them as strings
+    return {key: int(value) if key == "sequence_ID" or key.endswith("_position_ID") else value
+            for key, value in sequence.items()}
+
+def update_sequences(changed=(), deleted=()):
+    """Add or replace sequences by sequence_ID, drop the deleted ones, and store the result."""
+    replaced = {sequence["sequence_ID"]: sequence for sequence in map(_with_int_ids, changed)}
+    deleted = {int(sequence_ID) for sequence_ID in deleted}
+    sequences = [s for s in _sequences if s["sequence_ID"] not in replaced and s["sequence_ID"] not in deleted]
+    sequences.extend(replaced.values())
+    if snapshots.save("security_sequences", sequences):
+        set_sequences(sequences)
+
+def handle_backend_message(message):
+    if message.get("action") != "securitySequencesChanged":
+        return
+    data = message.get("data")
+    if data is None:
+        ws_client.in_background(refresh_sequences)
+    else:
+        update_sequences(data.get("changed", ()), data.get("deleted", ()))
+
+def reset():
+    global _node
+    with _lock:
+        _node = _root
+
+def feed(step):
+    """Advance the automaton with a step.
+
+    Returns (result, step_number) where result is ADVANCED, MATCHED or FAILED, or
+    (None, 0) for a repeat of the previous step, which is ignored.
+    """
+    global _node, _last_step
+    if not _loaded:
+        load_sequences()
+    with _lock:
+        if step == _last_step:
+            return None, 0
+        _last_step = step
+        node = _node.children.get(step)
+        step_number = _node.depth + 1
+        if node is None:
+            _node = _root
+            return FAILED, step_number
+        if node.sequence_ids:
+            _node = _root
+            return MATCHED, step_number
+        _node = node
+        return ADVANCED, step_number
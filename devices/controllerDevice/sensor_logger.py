@@ -0,0 +1,99 @@
+import json
+import logging
+import os
+import threading
+import time
+import ws_client
+from config import LOG_BATCH_SIZE, LOG_FLUSH_INTERVAL, LOG_BUFFER_LIMIT, LOG_SPILL_FILE
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Readings waiting to be sent to the backend
+_buffer = []
+_condition = threading.Condition()
+_thread = None
+_running = False
+
+def log_reading(sensor_id, distance):
+    """Buffer a reading for the backend; never blocks the caller on network I/O."""
+    with _condition:
+        _buffer.append({"sensor_ID": sensor_id, "distance": distance, "timestamp": time.time()})
+        if len(_buffer) >= LOG_BATCH_SIZE:
+            _condition.notify()
+
+def _send_batch(readings):
+    response = ws_client.request("logSensorDataBatch", {"readings": readings})
+    if response and response.get("action") == "logSensorDataBatch" and "error" not in response:
+        logger.debug(f"Logged {len(readings)} sensor readings")
+        return True
+    logger.warning(f"Failed to log {len(readings)} sensor readings: {(response or {}).get('error')}")
+    return False
+
+def _spill(readings):
+    os.makedirs(os.path.dirname(LOG_SPILL_FILE), exist_ok=True)
+    with open(LOG_SPILL_FILE, "a") as spill:
+        for reading in readings:
+            spill.write(json.dumps(reading) + "\n")
+    logger.info(f"Spilled {len(readings)} sensor readings to {LOG_SPILL_FILE}")
+
+def _replay_spill():
+    """Send spilled readings once the backend is reachable again."""
+    if not os.path.exists(LOG_SPILL_FILE) or not ws_client.client.is_connected():
+        return
+    replaying = LOG_SPILL_FILE + ".replay"
+    if not os.path.exists(replaying):
+        os.replace(LOG_SPILL_FILE, replaying)
+    with open(replaying) as spill:
+        readings = [json.loads(line) for line in spill if line.strip()]
+    for start in range(0, len(readings), LOG_BATCH_SIZE):
+        if not _send_batch(readings[start:start + LOG_BATCH_SIZE]):
+            _spill(readings[start:])
+            break
+    else:
+        logger.info(f"Replayed {len(readings)} spilled sensor readings")
+    os.remove(replaying)
+
+def _flush(readings):
+    for start in range(0, len(readings), LOG_BATCH_SIZE):
+        batch = readings[start:start + LOG_BATCH_SIZE]
+        if not ws_client.client.is_connected() or not _send_batch(batch):
+            _spill(readings[start:])
+            return False
+    return True
+
+def _run():
+    while True:
+        with _condition:
+            if _running and len(_buffer) < LOG_BATCH_SIZE:
+                _condition.wait(LOG_FLUSH_INTERVAL)
+            readings = _buffer[:]
+            del _buffer[:]
+            running = _running
+        try:
+            if len(readings) > LOG_BUFFER_LIMIT:
+                _spill(readings)  # The backend is falling behind; don't queue more requests on it
+            elif not readings or _flush(readings):
+                _replay_spill()
+        except Exception as e:
+            logger.error(f"Failed to flush sensor readings: {e}")
+        if not running:
+            return
+
+def start():
+    global _thread, _running
+    with _condition:
+        if _running:
+            return
+        _running = True
+    _thread = threading.Thread(target=_run, name="sensor-logger", daemon=True)
+    _thread.start()
+
+def stop(timeout=5):
+    """Flush what is buffered, spilling to disk if the backend is unreachable."""
+    global _running
+    with _condition:
+        _running = False
+        _condition.notify()
+    if _thread:
+        _thread.join(timeout)
@@ -0,0 +1,103 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from utils import retry_request
+from config import SNAPSHOT_DB
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Last-known-good copies of the backend configuration, one row per kind of config
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshot (
+    name TEXT PRIMARY KEY,
+    version TEXT NOT NULL,
+    data TEXT NOT NULL,
+    saved_at REAL NOT NULL
+)
+"""
+
+_lock = threading.Lock()
+_versions = {}  # name -> version of the stored snapshot, saves a read when checking for changes
+
+def _connect():
+    os.makedirs(os.path.dirname(SNAPSHOT_DB), exist_ok=True)
+    connection = sqlite3.connect(SNAPSHOT_DB, timeout=5)
+    connection.execute(_SCHEMA)
+    return connection
+
+def version_of(data):
+    """Content hash of a config payload, independent of key order."""
+    return hashlib.sha256(json.dumps(data, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+def load(name):
+    """Return the stored snapshot for name, or None."""
+    try:
+        with _lock:
+            connection = _connect()
+            try:
+                row = connection.execute("SELECT version, data FROM snapshot WHERE name = ?", (name,)).fetchone()
+            finally:
+                connection.close()
+    except sqlite3.Error as e:
+        logger.error(f"Failed to read snapshot {name}: {e}")
+        return None
+    if row is None:
+        return None
+    _versions[name] = row[0]
+    return json.loads(row[1])
+
+def save(name, data):
+    """Store data as the snapshot for name; returns whether it differs from the stored one."""
+    version = version_of(data)
+    if _versions.get(name) == version:
+        return False
+    try:
+        with _lock:
+            connection = _connect()
+            try:
+                with connection:
+                    connection.execute(
+                        "INSERT OR REPLACE INTO snapshot (name, version, data, saved_at) VALUES (?, ?, ?, ?)",
+                        (name, version, json.dumps(data), time.time()),
+                    )
+            finally:
+                connection.close()
+    except sqlite3.Error as e:
+        logger.error(f"Failed to write snapshot {name}: {e}")
+    _versions[name] = version
+    return True
+
+def refresh(name, action, apply, payload=None):
+    """Fetch config from the backend; apply and store it if it changed since the snapshot.
+
+    Returns False if the backend could not be reached, leaving the current config in place.
+    """
+    response = retry_request(action, payload)
+    if not response or response.get("action") != action or "error" in response or "data" not in response:
+        logger.error(f"Could not fetch {name} from the backend; keeping the last-known-good config")
+        return False
+    data = response["data"]
+    if save(name, data):
+        apply(data)
+        logger.info(f"Loaded {name} from the backend")
+    else:
+        logger.debug(f"Snapshot of {name} is current")
+    return True
+
+def load_config(name, action, apply, payload=None):
+    """Apply the stored snapshot at once and revalidate it in the background.
+
+    With no snapshot yet, fetches from the backend before returning.
+    """
+    data = load(name)
+    if data is None:
+        return refresh(name, action, apply, payload)
+    apply(data)
+    logger.info(f"Loaded {name} from snapshot; revalidating with the backend")
+    threading.Thread(target=refresh, args=(name, action, apply, payload), daemon=True).start()
+    return True
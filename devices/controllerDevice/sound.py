@@ -1,97 +1,161 @@
-import pygame
 import logging
-import websocket
-import json
-import time
-from config import WS_SERVER_URL
-
-# Initialize pygame mixer for playing sound
-pygame.mixer.init()
+import threading
+import ws_client
+import audio
+import assets
+import snapshots
+from range_index import RangeIndex
 
 # Global dictionaries
-sounds = {}
 ranges = []
-last_played = {}  # Dictionary to track last played note and timestamp for each sensor
-
-# Cooldown period in seconds
-COOLDOWN_PERIOD = 1
+range_index = RangeIndex(ranges)  # Rebuilt whenever ranges are reloaded
+note_map = {}  # (sensor_ID, range_ID) -> note_ID
+_ranges_lock = threading.Lock()  # Serialises targeted range updates from MQTT and the backend
 is_muted = False  # Mute state
 
 # Configure logging
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-def load_sounds(retries=5, delay=2):
-    for attempt in range(retries):
-        try:
-            ws = websocket.WebSocket()
-            ws.connect(WS_SERVER_URL)
-            payload = {"action": "getNotes"}
-            ws.send(json.dumps(payload))
-            response = ws.recv()
-            logger.debug(f"Received raw response for getNotes: {response}")
-            response_data = json.loads(response)
-            logger.debug(f"Parsed response for getNotes: {response_data}")
-            if response_data and response_data.get("action") == "getNotes":
-                notes = response_data.get("data", [])
-                for note in notes:
-                    if isinstance(note, dict):
-                        sounds[note["note_ID"]] = pygame.mixer.Sound(note["note_location"])
-                    else:
-                        logger.error(f"Unexpected note format: {note}")
-                logger.info("Sounds loaded successfully")
-                logger.debug(f"Loaded sounds: {sounds}")
-                ws.close()
-                return
-            else:
-                logger.critical(f"Failed to load sounds: Invalid response format: {response_data.get('message', '')}")
-        except Exception as e:
-            logger.error(f"Error loading sounds, attempt {attempt + 1} of {retries}: {e}")
-            time.sleep(delay)
-    logger.critical("Failed to load sounds after retries.")
-
-def load_ranges(retries=5, delay=2):
-    global ranges
-    for attempt in range(retries):
+def apply_notes(notes):
+    """Register the file for every note in a getNotes list and prefetch the mapped ones."""
+    valid = [note for note in notes if isinstance(note, dict)]
+    for note in notes:
+        if not isinstance(note, dict):
+            logger.error(f"Unexpected note format: {note}")
+    assets.register(valid)
+    prefetch_mapped_notes()
+
+def prefetch_mapped_notes():
+    # The action table only maps notes for the sensors that are installed
+    assets.prefetch(set(note_map.values()))
+
+def load_sounds():
+    if not snapshots.load_config("notes", "getNotes", apply_notes):
+        logger.critical("Failed to load sounds: no snapshot and the backend is unreachable.")
+
+def set_ranges(new_ranges):
+    """Compile and swap in a new range list; readers see either the old or the new index."""
+    global ranges, range_index
+    index = RangeIndex(new_ranges)
+    ranges, range_index = new_ranges, index
+
+def apply_ranges(new_ranges):
+    set_ranges(new_ranges)
+    logger.info("Ranges loaded successfully")
+    logger.debug(f"Loaded ranges: {ranges}")
+
+def _with_numeric_limits(row):
+    # The app sends limits from form fields, so pushed rows may carry them as strings
+    return {**row, "range_ID": int(row["range_ID"]),
+            **{key: float(row[key]) for key in ("lower_limit", "upper_limit") if key in row}}
+
+def update_ranges(rows):
+    """Replace the given ranges by range_ID, keep the rest, and store the result."""
+    global ranges, range_index
+    changed = {row["range_ID"]: row for row in map(_with_numeric_limits, rows)}
+    with _ranges_lock:
+        merged = [{**r, **changed.pop(r["range_ID"])} if r["range_ID"] in changed else r for r in ranges]
+        merged.extend(changed.values())
+        # Compile first so rows that cannot be used are never stored
         try:
-            ws = websocket.WebSocket()
-            ws.connect(WS_SERVER_URL)
-            payload = {"action": "getRanges"}
-            ws.send(json.dumps(payload))
-            response = ws.recv()
-            logger.debug(f"Received raw response for getRanges: {response}")
-            response_data = json.loads(response)
-            logger.debug(f"Parsed response for getRanges: {response_data}")
-            if response_data and response_data.get("action") == "getRanges":
-                ranges = response_data.get("data", [])
-                logger.info("Ranges loaded successfully")
-                logger.debug(f"Loaded ranges: {ranges}")
-                ws.close()
-                return
-            else:
-                logger.critical(f"Failed to load ranges: Invalid response format: {response_data.get('message', '')}")
-        except Exception as e:
-            logger.error(f"Error loading ranges, attempt {attempt + 1} of {retries}: {e}")
-            time.sleep(delay)
-    logger.critical("Failed to load ranges after retries.")
+            index = RangeIndex(merged)
+        except (KeyError, TypeError, ValueError) as e:
+            logger.error(f"Ignoring range update {rows}: {e!r}")
+            return
+        if not snapshots.save("ranges", merged):
+            return
+        ranges, range_index = merged, index
+    logger.info(f"Ranges updated: {rows}")
+
+def update_range_limits(close_upper, mid_upper):
+    """Apply a close,mid boundary pair as published to the LED strips on config/range_ledstrip."""
+    update_ranges([
+        {"range_ID": 1, "upper_limit": close_upper},
+        {"range_ID": 2, "lower_limit": close_upper, "upper_limit": mid_upper},
+        {"range_ID": 3, "lower_limit": mid_upper},
+    ])
+
+def load_ranges():
+    if not snapshots.load_config("ranges", "getRanges", apply_ranges):
+        logger.critical("Failed to load ranges: no snapshot and the backend is unreachable.")
+
+def _note_map_from_actions(actions):
+    return {(a["sensor_ID"], a["range_ID"]): a["note_ID"] for a in actions if a.get("note_ID") is not None}
+
+def apply_note_map(entries):
+    """Apply changed mapping entries in place, dropping keys whose note is cleared."""
+    for key, note_ID in entries.items():
+        if note_ID is None:
+            note_map.pop(key, None)
+        elif note_map.get(key) != note_ID:
+            note_map[key] = note_ID
+            assets.prefetch((note_ID,))
+            logger.info(f"Note mapping updated: sensor {key[0]}, range {key[1]} -> note {note_ID}")
+
+def set_note_map_rows(actions):
+    """Apply a full action table, changing only the entries that differ."""
+    fresh = _note_map_from_actions(actions)
+    changes = dict(fresh)
+    changes.update({key: None for key in note_map if key not in fresh})
+    apply_note_map(changes)
+
+def refresh_note_map():
+    """Reload the action table from the backend."""
+    return snapshots.refresh("note_map", "getActions", set_note_map_rows)
+
+def handle_backend_message(message):
+    if message.get("action") == "rangesChanged":
+        update_ranges(message["data"])
+        return
+    if message.get("action") != "noteMapChanged":
+        return
+    entries = message.get("data")
+    if entries is None:
+        ws_client.in_background(refresh_note_map)
+    else:
+        # The app sends IDs from form fields, so pushed entries may carry them as strings
+        apply_note_map({
+            (int(e["sensor_ID"]), int(e["range_ID"])): None if e["note_ID"] is None else int(e["note_ID"])
+            for e in entries
+        })
+        snapshots.save("note_map", [
+            {"sensor_ID": sensor_ID, "range_ID": range_ID, "note_ID": note_ID}
+            for (sensor_ID, range_ID), note_ID in note_map.items()
+        ])
+
+_listening = False
+
+def load_note_map():
+    global _listening
+    if not _listening:
+        ws_client.client.add_listener(handle_backend_message)
+        _listening = True
+    if snapshots.load_config("note_map", "getActions", set_note_map_rows):
+        logger.info(f"Note map loaded with {len(note_map)} entries")
+    else:
+        logger.critical("Failed to load note map: no snapshot and the backend is unreachable.")
+
+def lookup_note(sensor_id, range_id):
+    """Resolve the note for a position from the local table, asking the backend only on a miss."""
+    note_ID = note_map.get((sensor_id, range_id))
+    if note_ID is not None:
+        return note_ID
+    response = ws_client.request("getNoteDetails", {"sensor_ID": sensor_id, "range_ID": range_id}) or {}
+    if response.get("action") == "getNoteDetails" and "data" in response:
+        note_ID = response["data"]["note_ID"]
+        note_map[(sensor_id, range_id)] = note_ID
+        return note_ID
+    logger.warning(f"No note details found for sensor {sensor_id} at range {range_id}. Response: {response}")
+    return None
 
 def play_sound(note_ID):
     if is_muted:
         logger.info("Audio is muted, not playing sound.")
         return
-    
-    current_time = time.time()
-    last_played_time = last_played.get(note_ID, 0)
-    
-    if current_time - last_played_time < COOLDOWN_PERIOD:
-        logger.info(f"Cooldown period active for note ID {note_ID}. Not playing sound.")
-        return
-    
+
     try:
-        sound = sounds.get(note_ID)
-        if sound:
-            sound.play()
-            last_played[note_ID] = current_time
+        # A note that is not decoded yet plays as soon as it is, rather than holding up the caller
+        if assets.when_ready(note_ID, lambda sound: audio.play(sound, audio.PRIORITY_NOTE)):
             logger.info(f"Played sound for note ID {note_ID}")
         else:
             logger.warning(f"Sound for note ID {note_ID} not found.")
@@ -101,9 +165,11 @@ def play_sound(note_ID):
 def main():
     load_sounds()
     load_ranges()
+    load_note_map()
 
     # Example of playing a sound with a specific note ID
     play_sound(1)
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.DEBUG)
     main()
@@ -0,0 +1,85 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+import audio
+import metrics
+import mode_cache
+import position_registry
+import security
+from sound import load_sounds, load_ranges, load_note_map
+from game import build_step_graph, pregenerate_sequences
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# name -> (loader, names of the loads it needs first)
+LOADS = {
+    "mode": (mode_cache.init, ()),
+    "sounds": (load_sounds, ()),
+    "ranges": (load_ranges, ()),
+    "note_map": (load_note_map, ()),
+    "positions": (position_registry.load, ()),
+    "security": (security.load_sequences, ("positions",)),
+    "game": (pregenerate_sequences, ("positions",)),
+}
+
+# Loads each mode needs before it can handle a reading; the rest finish in the background
+MODE_REQUIREMENTS = {
+    1: ("ranges", "note_map", "sounds"),  # Musical Stairs
+    2: ("ranges", "note_map", "positions", "security"),  # Security
+    3: ("ranges", "note_map", "sounds", "positions"),  # Game
+    4: ("ranges", "note_map"),  # Synth
+}
+
+ready = threading.Event()
+READY = metrics.gauge("staircase_ready", "1 once the active mode's configuration is loaded",
+                      read=lambda: int(ready.is_set()))
+_futures = {}
+_started_at = None
+
+def _run(name, loader, needs):
+    wait([_futures[need] for need in needs])
+    started = time.perf_counter()
+    loader()
+    logger.info(f"Startup: {name} loaded in {time.perf_counter() - started:.2f}s")
+
+def start():
+    """Initialise audio and begin every configuration load in parallel; returns at once."""
+    global _started_at
+    if _futures:
+        return
+    _started_at = time.perf_counter()
+    audio.init()  # The one mixer initialisation; sounds cannot be decoded before it
+    position_registry.add_listener(build_step_graph)  # Game and security steps follow the registry
+    position_registry.add_listener(security.recompile)
+    # One thread per load so a load waiting on another never starves the pool
+    executor = ThreadPoolExecutor(max_workers=len(LOADS), thread_name_prefix="startup")
+    for name, (loader, needs) in LOADS.items():
+        _futures[name] = executor.submit(_run, name, loader, needs)
+    executor.shutdown(wait=False)
+
+def wait_ready(timeout=None):
+    """Block until the active mode's loads are done, or the timeout passes; returns whether ready."""
+    deadline = None if timeout is None else time.monotonic() + timeout
+    remaining = lambda: None if deadline is None else max(0, deadline - time.monotonic())
+
+    wait([_futures["mode"]], timeout=remaining())
+    mode = mode_cache.cached_mode()  # Never a backend fetch here; it could outlast the timeout
+    needs = MODE_REQUIREMENTS.get(mode, tuple(LOADS))
+    done, pending = wait([_futures[name] for name in needs], timeout=remaining())
+    if pending:
+        logger.warning(f"Startup: still waiting for {sorted(n for n in needs if not _futures[n].done())}")
+        return False
+    for future in done:
+        if future.exception() is not None:
+            logger.error(f"Startup load failed: {future.exception()}")
+    ready.set()
+    background = sorted(name for name, future in _futures.items() if not future.done())
+    logger.info(f"Controller ready for mode {mode} in {time.perf_counter() - _started_at:.2f}s"
+                + (f"; still loading {background}" if background else ""))
+    return True
+
+def wait_all(timeout=None):
+    """Block until every load has finished; for tools that need the full configuration."""
+    wait(list(_futures.values()), timeout=timeout)
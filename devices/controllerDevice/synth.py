@@ -1,13 +1,14 @@
 import numpy as np
 import pygame
 import pygame.sndarray
+import atexit
 import logging
-
-# Initialize pygame mixer for synthesizing sound
-pygame.mixer.init()
+import threading
+import time
+import audio
+from config import SYNTH_BLOCK, SYNTH_VOLUME, SYNTH_GLIDE_TIME, SYNTH_ATTACK, SYNTH_RELEASE, SYNTH_HOLD
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Base frequencies for each sensor
@@ -17,37 +18,177 @@ BASE_FREQUENCIES = {
     3: 523,  # C5
 }
 
-def synthesize_tone(frequency, duration, volume=0.5, sample_rate=44100):
-    """Generate a synthesized tone with a given frequency and duration."""
-    n_samples = int(sample_rate * duration)
-    t = np.linspace(0, duration, n_samples, False)
-    waveform = 0.5 * np.sin(2 * np.pi * frequency * t)
-    
-    # Ensure waveform is in the right format and apply volume
-    waveform = np.int16(waveform * volume * 32767)
-    sound = pygame.sndarray.make_sound(waveform)
-    return sound
+WAVETABLE_SIZE = 4096  # Samples in the single-cycle wavetable
+
+# One cycle of the waveform, rendered once and indexed by phase
+WAVETABLE = (0.5 * np.sin(2 * np.pi * np.arange(WAVETABLE_SIZE) / WAVETABLE_SIZE)).astype(np.float32)
+
+class Voice:
+    """A sensor's continuous tone, streamed to its own channel one block at a time.
+
+    Each block is rendered into one of a few preallocated Sounds and queued behind the
+    one playing. Phase carries over between blocks, so pitch glides without clicks.
+    """
+
+    __slots__ = ("sensor_id", "channel", "blocks", "next_block", "phase", "frequency",
+                 "target_frequency", "amplitude", "released", "updated_at")
+
+    def __init__(self, sensor_id, channel, block_size, channels):
+        self.sensor_id = sensor_id
+        self.channel = channel
+        # Three blocks: one playing, one queued, one free to render into
+        self.blocks = [pygame.mixer.Sound(buffer=bytes(block_size * channels * 2)) for _ in range(3)]
+        self.next_block = 0
+        self.phase = 0.0
+        self.frequency = None
+        self.target_frequency = None
+        self.amplitude = 0.0
+        self.released = False
+        self.updated_at = 0.0
+
+    def note_on(self, frequency):
+        if self.frequency is None:
+            self.frequency = frequency  # Start at pitch rather than gliding up from nothing
+        self.target_frequency = frequency
+        self.released = False
+        self.updated_at = time.monotonic()
+
+    def note_off(self):
+        self.released = True
+
+    def render(self, sample_rate, block_size):
+        """Render and queue the next block if the channel has room; returns False once silent."""
+        if self.channel.get_queue() is not None:
+            return True
+        n = block_size
+        block_time = n / sample_rate
+        start_frequency = self.frequency
+        self.frequency += (self.target_frequency - self.frequency) * min(1.0, block_time / SYNTH_GLIDE_TIME)
+        if self.released:
+            target_amplitude = max(0.0, self.amplitude - block_time / SYNTH_RELEASE)
+        else:
+            target_amplitude = min(1.0, self.amplitude + block_time / SYNTH_ATTACK)
+
+        # Per-sample phase increments ramp linearly from the old to the new frequency
+        increments = _stream_increments[:n]
+        np.multiply(_stream_ramp[:n], self.frequency - start_frequency, out=increments)
+        increments += start_frequency
+        increments *= WAVETABLE_SIZE / sample_rate
+        phase = _stream_phase[:n]
+        np.cumsum(increments, out=phase)
+        phase += self.phase
+        self.phase = float(phase[-1]) % WAVETABLE_SIZE
+        np.mod(phase, WAVETABLE_SIZE, out=phase)
+        table_index = _stream_index[:n]
+        np.copyto(table_index, phase, casting="unsafe")
+        samples = _stream_samples[:n]
+        np.take(WAVETABLE, table_index, out=samples)
+        envelope = _stream_envelope[:n]
+        np.multiply(_stream_ramp[:n], target_amplitude - self.amplitude, out=envelope)
+        envelope += self.amplitude
+        samples *= envelope
+        samples *= SYNTH_VOLUME * 2 * 32767  # The wavetable peaks at 0.5
+        self.amplitude = target_amplitude
+
+        block = self.blocks[self.next_block]
+        self.next_block = (self.next_block + 1) % len(self.blocks)
+        pcm = pygame.sndarray.samples(block)  # Writes straight into the Sound's buffer
+        if pcm.ndim == 1:
+            np.copyto(pcm, samples, casting="unsafe")
+        else:
+            for channel in range(pcm.shape[1]):
+                np.copyto(pcm[:, channel], samples, casting="unsafe")
+        del pcm  # Release the buffer lock before the mixer reads the block
+        if self.channel.get_busy():
+            self.channel.queue(block)
+        else:
+            self.channel.play(block)
+        return not (self.released and self.amplitude <= 0.0)
+
+_voices = {}  # sensor_ID -> Voice
+_voices_lock = threading.Lock()
+_stream_thread = None
+_stopping = threading.Event()
+# Scratch buffers for block rendering, used only by the stream thread
+_stream_ramp = _stream_increments = _stream_phase = _stream_index = _stream_samples = _stream_envelope = None
+
+def _stream():
+    global _stream_ramp, _stream_increments, _stream_phase, _stream_index, _stream_samples, _stream_envelope
+    sample_rate = pygame.mixer.get_init()[0]
+    _stream_ramp = np.arange(1, SYNTH_BLOCK + 1, dtype=np.float64) / SYNTH_BLOCK
+    _stream_increments = np.empty(SYNTH_BLOCK, dtype=np.float64)
+    _stream_phase = np.empty(SYNTH_BLOCK, dtype=np.float64)
+    _stream_index = np.empty(SYNTH_BLOCK, dtype=np.intp)
+    _stream_samples = np.empty(SYNTH_BLOCK, dtype=np.float32)
+    _stream_envelope = np.empty(SYNTH_BLOCK, dtype=np.float32)
+    # Wake several times per block so a block is always queued before the current one ends
+    interval = SYNTH_BLOCK / sample_rate / 4
+    while not _stopping.is_set():
+        now = time.monotonic()
+        with _voices_lock:
+            voices = list(_voices.values())
+        for voice in voices:
+            if not voice.released and now - voice.updated_at > SYNTH_HOLD:
+                voice.note_off()  # The sensor has stopped reporting; fade out
+            try:
+                active = voice.render(sample_rate, SYNTH_BLOCK)
+            except Exception as e:
+                logger.error(f"Synth voice for sensor {voice.sensor_id} failed: {e}")
+                active = False
+            if not active:
+                with _voices_lock:
+                    _voices.pop(voice.sensor_id, None)
+                audio.release_channel(voice.channel)
+        _stopping.wait(interval)
+
+@atexit.register
+def _stop_stream():
+    # Registered after pygame's own exit handler, so it runs first; rendering into a
+    # Sound once the mixer has quit crashes the interpreter
+    _stopping.set()
+    if _stream_thread is not None:
+        _stream_thread.join(timeout=1)
+
+def _voice(sensor_id):
+    global _stream_thread
+    with _voices_lock:
+        voice = _voices.get(sensor_id)
+        if voice is None:
+            channel = audio.reserve_channel()
+            if channel is None:
+                logger.info(f"No streaming channel free for sensor {sensor_id}")
+                return None
+            _, _, channels = pygame.mixer.get_init()
+            voice = _voices[sensor_id] = Voice(sensor_id, channel, SYNTH_BLOCK, channels)
+        if _stream_thread is None:
+            _stream_thread = threading.Thread(target=_stream, name="synth", daemon=True)
+            _stream_thread.start()
+    return voice
 
 def play_synthesized_tone(sensor_id, distance):
-    """Play a synthesized tone based on sensor ID and distance."""
+    """Glide the sensor's voice to the pitch for the distance, starting it if it is silent."""
     # Get the base frequency for the given sensor
     base_frequency = BASE_FREQUENCIES.get(sensor_id, 440)  # Default to A4 if sensor_id is not found
     max_distance = 50  # Maximum distance is 50 cm
     
     # Calculate the frequency based on the distance
     frequency = base_frequency * (1 + distance / max_distance)
-    logger.info(f"Playing synthesized tone for sensor {sensor_id} at frequency {frequency:.2f} Hz")
+    logger.debug(f"Synth voice for sensor {sensor_id} gliding to {frequency:.2f} Hz")
     
-    # Synthesize and play the tone
-    duration = 1.0  # 1 second duration
-    tone = synthesize_tone(frequency, duration)
-    tone.play()
+    voice = _voice(sensor_id)
+    if voice is not None:
+        voice.note_on(frequency)
 
 def stop_all_sounds():
-    """Stop all currently playing sounds."""
-    pygame.mixer.stop()
+    """Fade out every synth voice and stop all other sounds."""
+    with _voices_lock:
+        voices = list(_voices.values())
+    for voice in voices:
+        voice.note_off()
+    audio.stop_all()
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
     # Example usage: Play tones for different sensors
     play_synthesized_tone(sensor_id=1, distance=25)  # Sensor 1 at 25 cm
     pygame.time.wait(1000)  # Wait for the sound to finish
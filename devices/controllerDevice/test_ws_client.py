@@ -0,0 +1,39 @@
+from ws_client import BackendClient
+
+
+def make_client(*requests):
+    """A client that is not connected, with the given (request_id, action) requests pending."""
+    client = BackendClient("ws://localhost")
+    return client, {request_id: client._track(request_id, action, 5) for request_id, action in requests}
+
+
+def test_reply_matched_by_request_id():
+    client, pending = make_client(("a", "getNoteDetails"), ("b", "getNoteDetails"))
+    assert client._match({"action": "getNoteDetails", "request_id": "b"}) is pending["b"]
+    assert client._match({"action": "getNoteDetails", "request_id": "a"}) is pending["a"]
+
+
+def test_late_reply_is_not_given_to_the_next_request():
+    client, pending = make_client(("a", "getNoteDetails"))
+    client._forget(pending["a"])  # Timed out
+    client._track("b", "getNoteDetails", 5)
+    assert client._match({"action": "getNoteDetails", "request_id": "a", "data": {"note_ID": 7}}) is None
+    assert "b" in client._pending
+
+
+def test_untagged_reply_matched_by_action_in_order():
+    client, pending = make_client(("a", "getRanges"), ("b", "getRanges"), ("c", "updateSensorStatus"))
+    assert client._match({"action": "update_sensor_status"}) is pending["c"]
+    assert client._match({"action": "getRanges", "data": []}) is pending["a"]
+
+
+def test_bare_error_only_answers_requests_that_reply_with_one():
+    client, pending = make_client(("a", "getNoteDetails"), ("b", "setLEDColors"))
+    assert client._match({"action": "error", "message": "Invalid sensor name"}) is pending["b"]
+    assert client._match({"action": "error", "message": "Invalid sensor name"}) is None
+    assert "a" in client._pending
+
+
+def test_broadcast_is_not_a_reply():
+    client, pending = make_client(("a", "logSensorData"))
+    assert client._match({"action": "logSensorData", "data": []}) is None
@@ -0,0 +1,282 @@
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+import websocket
+import metrics
+from config import WS_SERVER_URL, WS_REQUEST_TIMEOUT, WS_PING_INTERVAL, WS_PING_TIMEOUT, WS_RECONNECT_DELAY
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+REQUEST_SECONDS = metrics.histogram("staircase_backend_request_seconds", "Backend request round trip time")
+RECONNECTS = metrics.counter("staircase_ws_reconnects_total", "Backend WebSocket reconnections",
+                             read=lambda: client.reconnects)
+
+# Actions whose reply comes back under a different action name
+RESPONSE_ACTIONS = {
+    "sendLEDTrigger": "LEDTrigger",
+    "getLEDTriggerPayload": "LEDTrigger",
+    "updateSensorStatus": "update_sensor_status",
+    "updateSensorAlive": "update_sensor_status",
+    "updateLedStripAlive": "updateLedStripStatus",
+}
+
+# Requests the backend may answer with a bare {"action": "error"} that carries no request_id
+ERROR_REPLY_ACTIONS = {"determineLEDColor", "getNotes", "getRanges", "setLEDColors"}
+
+
+def encode_request(action, payload=None):
+    """Tag a request with a fresh request_id and serialise it for the wire."""
+    request_id = str(uuid.uuid4())
+    payload = dict(payload or {})
+    payload["request_id"] = request_id
+    return request_id, json.dumps({"action": action, "payload": payload})
+
+
+def decode_response(raw):
+    """Parse a frame received from the backend."""
+    return json.loads(raw)
+
+
+def in_background(func, *args):
+    """Run func(*args) on its own thread.
+
+    Listeners are called on the WebSocket thread, which must stay free to receive
+    replies, so anything they do that requests from the backend goes through here.
+    """
+    threading.Thread(target=func, args=args, daemon=True).start()
+
+
+def is_broadcast(message):
+    """Return True for messages the backend pushes to every connected client."""
+    if message.get("type") == "alarm":
+        return True
+    # logSensorData replies carry a message, the broadcast to all clients carries data
+    return message.get("action") == "logSensorData" and "data" in message
+
+
+class _Pending:
+    __slots__ = ("request_id", "action", "deadline", "event", "response")
+
+    def __init__(self, request_id, action, deadline):
+        self.request_id = request_id
+        self.action = action
+        self.deadline = deadline
+        self.event = threading.Event()
+        self.response = None
+
+
+class BackendClient:
+    """Single long-lived WebSocket connection shared by every controller module.
+
+    Requests are matched to replies by request_id when the backend echoes it,
+    otherwise by reply action in the order the requests were sent.
+    """
+
+    def __init__(self, url):
+        self.url = url
+        self._app = None
+        self._thread = None
+        self._running = False
+        self._connected = threading.Event()
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._by_action = {}
+        self._listeners = []
+        self.reconnects = 0
+
+    def start(self):
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name="ws-client", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._app:
+            self._app.close()
+
+    def is_connected(self):
+        return self._connected.is_set()
+
+    def add_listener(self, callback):
+        """Register a callback for messages that are not replies to our requests."""
+        self._listeners.append(callback)
+
+    def request(self, action, payload=None, timeout=WS_REQUEST_TIMEOUT):
+        """Send a request and block until its reply arrives or the timeout expires."""
+        started = metrics.clock()
+        pending = self._submit(action, payload, timeout)
+        if pending is None:
+            return None
+        if not pending.event.wait(timeout):
+            self._forget(pending)
+            logger.error(f"Timed out waiting for {action} response")
+            return None
+        REQUEST_SECONDS.observe_since(started)
+        return pending.response
+
+    def send(self, action, payload=None):
+        """Send a request without waiting; its reply is consumed and discarded.
+
+        Dropped with an error if the backend is not connected right now.
+        """
+        return self._submit(action, payload, WS_REQUEST_TIMEOUT, connect_timeout=0) is not None
+
+    def notify(self, action, payload=None):
+        """Send a message the backend does not reply to."""
+        if not self._wait_connected(WS_REQUEST_TIMEOUT):
+            logger.error(f"WebSocket not connected, dropping {action}")
+            return False
+        try:
+            self._app.send(json.dumps({"action": action, "payload": payload or {}}))
+            return True
+        except websocket.WebSocketException as e:
+            logger.error(f"WebSocket error: {e}")
+            return False
+
+    def _wait_connected(self, timeout):
+        self.start()
+        return self._connected.wait(timeout)
+
+    def _submit(self, action, payload, timeout, connect_timeout=None):
+        if not self._wait_connected(timeout if connect_timeout is None else connect_timeout):
+            logger.error(f"WebSocket not connected, cannot send {action}")
+            return None
+        request_id, frame = encode_request(action, payload)
+        pending = self._track(request_id, action, timeout)
+        try:
+            self._app.send(frame)
+        except websocket.WebSocketException as e:
+            logger.error(f"WebSocket error sending {action}: {e}")
+            self._forget(pending)
+            return None
+        logger.debug(f"Sent request: {action}, request_id: {request_id}")
+        return pending
+
+    def _track(self, request_id, action, timeout):
+        pending = _Pending(request_id, RESPONSE_ACTIONS.get(action, action), time.time() + timeout)
+        with self._lock:
+            self._expire(pending.deadline - timeout)
+            self._pending[request_id] = pending
+            self._by_action.setdefault(pending.action, deque()).append(request_id)
+        return pending
+
+    def _forget(self, pending):
+        with self._lock:
+            self._pop(pending.request_id)
+
+    def _pop(self, request_id):
+        # Caller holds self._lock
+        pending = self._pending.pop(request_id, None)
+        if pending is not None:
+            queue = self._by_action.get(pending.action)
+            if queue and request_id in queue:
+                queue.remove(request_id)
+        return pending
+
+    def _expire(self, now):
+        # Caller holds self._lock; drops replies nobody is waiting for any more
+        while self._pending:
+            oldest = next(iter(self._pending.values()))
+            if oldest.deadline > now:
+                break
+            self._pop(oldest.request_id)
+
+    def _match(self, message):
+        """Return the pending request a reply answers, or None.
+
+        A reply tagged with a request_id only ever answers that request; untagged
+        replies go to the oldest request waiting for their action.
+        """
+        request_id = message.get("request_id")
+        with self._lock:
+            if request_id is not None:
+                return self._pop(request_id)
+            if is_broadcast(message):
+                return None
+            queue = self._by_action.get(message.get("action"))
+            if queue:
+                return self._pop(queue[0])
+            if message.get("action") == "error":
+                # Bare errors carry no request_id; only some requests can be answered by one
+                for pending in self._pending.values():
+                    if pending.action in ERROR_REPLY_ACTIONS:
+                        return self._pop(pending.request_id)
+        return None
+
+    def _on_open(self, app):
+        logger.info(f"Connected to backend at {self.url}")
+        self._connected.set()
+
+    def _on_message(self, app, raw):
+        try:
+            message = decode_response(raw)
+        except json.JSONDecodeError as e:
+            logger.error(f"JSON decode error: {e} - Response content: {raw}")
+            return
+        pending = self._match(message)
+        if pending is not None:
+            pending.response = message
+            pending.event.set()
+            return
+        if message.get("request_id") is not None:
+            logger.debug(f"Dropping late {message.get('action')} reply, request {message['request_id']}")
+            return
+        for listener in self._listeners:
+            try:
+                listener(message)
+            except Exception as e:
+                logger.error(f"Backend listener failed: {e}")
+
+    def _on_error(self, app, error):
+        logger.error(f"WebSocket error: {error}")
+
+    def _on_close(self, app, status_code, reason):
+        self._connected.clear()
+        with self._lock:
+            pending = list(self._pending.values())
+            self._pending.clear()
+            self._by_action.clear()
+        for p in pending:
+            p.event.set()
+        logger.warning(f"Backend connection closed ({status_code}); {len(pending)} request(s) failed")
+
+    def _run(self):
+        while self._running:
+            self._app = websocket.WebSocketApp(
+                self.url,
+                on_open=self._on_open,
+                on_message=self._on_message,
+                on_error=self._on_error,
+                on_close=self._on_close,
+            )
+            try:
+                self._app.run_forever(ping_interval=WS_PING_INTERVAL, ping_timeout=WS_PING_TIMEOUT)
+            except Exception as e:
+                logger.error(f"WebSocket loop crashed: {e}")
+            self._connected.clear()
+            if self._running:
+                self.reconnects += 1
+                logger.info(f"Reconnecting to backend in {WS_RECONNECT_DELAY} seconds")
+                time.sleep(WS_RECONNECT_DELAY)
+
+
+client = BackendClient(WS_SERVER_URL)
+
+
+def request(action, payload=None, timeout=WS_REQUEST_TIMEOUT):
+    return client.request(action, payload, timeout)
+
+
+def send(action, payload=None):
+    return client.send(action, payload)
+
+
+def notify(action, payload=None):
+    return client.notify(action, payload)